@@ -1,44 +1,64 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+import time
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.datastructures import MutableHeaders
 import os
+import io
+import csv
+import hmac
+import gzip
+import json
+import fcntl
+import random
+import hashlib
+import contextvars
+import math
+import itertools
+import importlib.util
+import multiprocessing
+import zlib
+import socket
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
-from passlib.context import CryptContext
 import aiofiles
 import mimetypes
 from enum import Enum
 
-# Stripe Integration
-from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
+# Heavy subsystems (Stripe integration, passlib/bcrypt, Motor) are imported and
+# created lazily or in the startup handler so that new workers come up fast.
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create uploads directory
 UPLOAD_DIR = ROOT_DIR / "uploads" / "videos"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# MongoDB connection
+# MongoDB connection (client is created in the startup handler)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
+db = None
 
 # Security setup
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
 security = HTTPBearer()
 
 # Stripe configuration
@@ -46,11 +66,94 @@ STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
 if not STRIPE_API_KEY:
     logging.warning("STRIPE_API_KEY not found in environment variables")
 
+# Startup timing report: phase name -> milliseconds
+STARTUP_REPORT: Dict[str, float] = {}
+_startup_state = {"ready": False}
+
+def _record_startup_phase(name: str, started: float):
+    STARTUP_REPORT[name] = round((time.perf_counter() - started) * 1000, 2)
+
+# Request tracing: spans (Mongo commands, bcrypt, Stripe) recorded against the
+# request currently being served. Motor runs commands in executor threads with
+# a copy of the caller's context, so the Mongo listener sees the same trace.
+MAX_SPANS_PER_REQUEST = 500
+_current_trace: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_trace", default=None)
+
+def record_span(kind: str, duration_ms: float, **attrs):
+    trace = _current_trace.get()
+    if trace is not None and len(trace["spans"]) < MAX_SPANS_PER_REQUEST:
+        trace["spans"].append({"kind": kind, "duration_ms": round(duration_ms, 3), **attrs})
+
+def create_untraced_task(coro, **kwargs) -> asyncio.Task:
+    """Start a task outside the caller's trace so work outliving the request is not attributed to it"""
+    return contextvars.Context().run(asyncio.create_task, coro, **kwargs)
+
+@contextmanager
+def trace_span(kind: str, **attrs):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(kind, (time.perf_counter() - started) * 1000, **attrs)
+
+def make_mongo_span_listener():
+    """Build a pymongo command listener that records Mongo calls as spans"""
+    from pymongo import monitoring
+
+    class MongoSpanListener(monitoring.CommandListener):
+        def __init__(self):
+            self._started: Dict[int, tuple] = {}
+
+        def started(self, event):
+            trace = _current_trace.get()
+            if trace is not None:
+                collection = event.command.get(event.command_name)
+                self._started[event.request_id] = (trace, collection if isinstance(collection, str) else None)
+
+        def _finish(self, event, failed: bool):
+            started = self._started.pop(event.request_id, None)
+            if started is None:
+                return
+            trace, collection = started
+            if len(trace["spans"]) < MAX_SPANS_PER_REQUEST:
+                trace["spans"].append({
+                    "kind": "mongo",
+                    "command": event.command_name,
+                    "collection": collection,
+                    "duration_ms": event.duration_micros / 1000,
+                    **({"failed": True} if failed else {})
+                })
+
+        def succeeded(self, event):
+            self._finish(event, failed=False)
+
+        def failed(self, event):
+            self._finish(event, failed=True)
+
+    return MongoSpanListener()
+
+def get_pwd_context():
+    """Create the passlib context on first use (loads the bcrypt backend)"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def get_stripe_checkout(api_key: str, webhook_url: str):
+    """Import the Stripe integration on first checkout and build a client"""
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout
+    return StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+
+def get_checkout_session_request(**kwargs):
+    from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
+    return CheckoutSessionRequest(**kwargs)
+
 # Create the main app
 app = FastAPI(title="TEC Future-Ready Learning Platform")
 
-# Serve uploaded videos
-app.mount("/uploads", StaticFiles(directory=str(ROOT_DIR / "uploads")), name="uploads")
+# Serve uploaded videos (directory is created in the startup handler)
+app.mount("/uploads", StaticFiles(directory=str(ROOT_DIR / "uploads"), check_dir=False), name="uploads")
 
 # Create API router
 api_router = APIRouter(prefix="/api")
@@ -313,10 +416,12 @@ def get_pricing_key_from_age(age_group: AgeGroup) -> str:
     return mapping[age_group]
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with trace_span("bcrypt", operation="verify"):
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with trace_span("bcrypt", operation="hash"):
+        return get_pwd_context().hash(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -325,6 +430,135 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# In-process caches and cross-worker invalidation bus
+#
+# Every uvicorn worker keeps its own caches. Writes publish invalidation keys on
+# the bus, which applies them locally and forwards them as Unix datagrams to the
+# other workers on this host. A key ending in "*" invalidates by prefix.
+CACHE_BUS_DIR = Path(os.environ.get('CACHE_BUS_DIR', '/tmp/tec-cache-bus'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '30'))
+
+class LocalCache:
+    """Bounded in-process TTL cache"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        if key.endswith("*"):
+            prefix = key[:-1]
+            for cached_key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[cached_key]
+        else:
+            self._entries.pop(key, None)
+
+class CacheInvalidationBus:
+    """Broadcasts invalidation keys to all workers on this host over Unix datagram sockets"""
+
+    MAX_KEYS_PER_MESSAGE = 100
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path: Optional[Path] = None
+        self._sock: Optional[socket.socket] = None
+        self._subscribers: List[tuple] = []
+
+    def subscribe(self, prefix: str, callback: Callable[[str], None]):
+        """Call `callback(key)` for every published key starting with `prefix`"""
+        self._subscribers.append((prefix, callback))
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{os.getpid()}.sock"
+        self.path.unlink(missing_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    def stop(self):
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        self.path.unlink(missing_ok=True)
+
+    def publish(self, *keys: str):
+        """Apply keys in this worker and forward them to every peer worker"""
+        keys = list(keys)
+        self._apply(keys)
+        if self._sock is None:
+            return
+        for i in range(0, len(keys), self.MAX_KEYS_PER_MESSAGE):
+            message = json.dumps(keys[i:i + self.MAX_KEYS_PER_MESSAGE]).encode()
+            for peer in self.directory.glob("*.sock"):
+                if peer == self.path:
+                    continue
+                try:
+                    self._sock.sendto(message, str(peer))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Socket left behind by a worker that has exited
+                    peer.unlink(missing_ok=True)
+                except BlockingIOError:
+                    logger.warning(f"Cache bus peer {peer.name} is not draining; invalidation dropped")
+
+    def _on_readable(self):
+        while self._sock is not None:
+            try:
+                message = self._sock.recv(65536)
+            except BlockingIOError:
+                return
+            try:
+                self._apply(json.loads(message))
+            except ValueError:
+                logger.warning("Ignoring malformed cache bus message")
+
+    def _apply(self, keys: List[str]):
+        for key in keys:
+            for prefix, callback in self._subscribers:
+                if key.startswith(prefix):
+                    try:
+                        callback(key)
+                    except Exception:
+                        logger.exception(f"Cache invalidation handler failed for {key}")
+
+cache_bus = CacheInvalidationBus(CACHE_BUS_DIR)
+user_cache = LocalCache(USER_CACHE_TTL_SECONDS)
+catalog_cache = LocalCache(CATALOG_CACHE_TTL_SECONDS, max_entries=1000)
+cache_bus.subscribe("user:", user_cache.invalidate)
+cache_bus.subscribe("courses:", catalog_cache.invalidate)
+
+def invalidate_user(user_id: str):
+    """Call after any write to a user document (profile, subscription, role)"""
+    cache_bus.publish(f"user:{user_id}")
+
+def publish_learning_path_change(*student_ids: str):
+    """Call after creating or updating learning paths"""
+    cache_bus.publish(*[
+        key for student_id in student_ids
+        for key in (f"analytics:student:{student_id}", f"leaderboard:student:{student_id}")
+    ])
+
 async def log_activity(user_id: str, activity_type: ActivityType, details: Dict[str, Any] = None, request: Request = None):
     """Log user activity for analytics"""
     activity = {
@@ -337,6 +571,7 @@ async def log_activity(user_id: str, activity_type: ActivityType, details: Dict[
         "user_agent": request.headers.get("user-agent") if request else None
     }
     await db.activity_logs.insert_one(activity)
+    cache_bus.publish(f"analytics:student:{user_id}")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
@@ -347,11 +582,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user = await db.users.find_one({"id": user_id})
+    user = user_cache.get(f"user:{user_id}")
     if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+        user = await db.users.find_one({"id": user_id})
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = User(**user)
+        user_cache.set(f"user:{user_id}", user)
     
-    return User(**user)
+    return user
 
 async def get_current_teacher(current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.TEACHER, UserRole.ADMIN]:
@@ -396,6 +635,9 @@ async def register_user(user: UserCreate, request: Request):
     
     # Log registration activity
     await log_activity(user_obj.id, ActivityType.LOGIN, {"action": "registration"}, request)
+    invalidate_user(user_obj.id)
+    if user_obj.role == UserRole.STUDENT and user_obj.learning_level:
+        publish_learning_path_change(user_obj.id)
     
     return user_obj
 
@@ -429,22 +671,43 @@ async def get_learning_framework():
     """Get the complete TEC learning framework"""
     return LEARNING_FRAMEWORK
 
+async def ensure_learning_path_indexes():
+    # The upsert in ensure_learning_path only stays one-per-student with this index
+    await db.learning_paths.create_index("student_id", unique=True)
+
+async def ensure_learning_path(current_user: User) -> Dict[str, Any]:
+    """Fetch the student's learning path, creating it atomically if missing"""
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    default_path = LearningPathProgress(
+        student_id=current_user.id,
+        learning_level=current_user.learning_level or LearningLevel.FOUNDATION,
+        skill_progress={skill.value: 0 for skill in SkillArea}
+    ).dict()
+    del default_path["student_id"]
+    try:
+        learning_path = await db.learning_paths.find_one_and_update(
+            {"student_id": current_user.id},
+            {"$setOnInsert": default_path},
+            upsert=True,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert inserted first
+        learning_path = await db.learning_paths.find_one({"student_id": current_user.id}, {"_id": 0})
+    if learning_path["id"] == default_path["id"]:
+        publish_learning_path_change(current_user.id)
+    return learning_path
+
 @api_router.get("/learning-path")
 async def get_learning_path(current_user: User = Depends(get_current_user)):
     """Get student's learning path progress"""
     if current_user.role != UserRole.STUDENT:
         raise HTTPException(status_code=403, detail="Only students have learning paths")
     
-    learning_path = await db.learning_paths.find_one({"student_id": current_user.id})
-    if not learning_path:
-        # Create learning path if doesn't exist
-        learning_path = LearningPathProgress(
-            student_id=current_user.id,
-            learning_level=current_user.learning_level or LearningLevel.FOUNDATION,
-            skill_progress={skill.value: 0 for skill in SkillArea}
-        )
-        await db.learning_paths.insert_one(learning_path.dict())
-        learning_path = learning_path.dict()
+    learning_path = await ensure_learning_path(current_user)
     
     # Add framework information
     framework_info = LEARNING_FRAMEWORK.get(learning_path["learning_level"], LEARNING_FRAMEWORK["foundation"])
@@ -487,10 +750,10 @@ async def create_subscription_checkout(
     # Initialize Stripe checkout
     host_url = str(request.base_url).rstrip("/")
     webhook_url = f"{host_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+    stripe_checkout = get_stripe_checkout(STRIPE_API_KEY, webhook_url)
     
     # Create checkout session
-    checkout_request = CheckoutSessionRequest(
+    checkout_request = get_checkout_session_request(
         amount=amount,
         currency="lkr",
         success_url=subscription_request["success_url"],
@@ -504,15 +767,210 @@ async def create_subscription_checkout(
         }
     )
     
-    session = await stripe_checkout.create_checkout_session(checkout_request)
+    with trace_span("stripe", operation="create_checkout_session"):
+        session = await stripe_checkout.create_checkout_session(checkout_request)
     
     return {"checkout_url": session.url, "session_id": session.session_id}
 
+# Cluster-wide leases
+#
+# A document per lease in the `locks` collection; whoever inserts it, or takes
+# it over once expires_at has passed, holds it until release or expiry. Used
+# for jobs that must run on one worker across all hosts.
+async def acquire_lease(name: str, ttl_seconds: float) -> Optional[str]:
+    """Take the named lease; return an owner token, or None if someone else holds it"""
+    from pymongo.errors import DuplicateKeyError
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4()}"
+    now = datetime.utcnow()
+    try:
+        await db.locks.update_one(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease exists and has not expired
+        return None
+    return owner
+
+async def renew_lease(name: str, owner: str, ttl_seconds: float) -> bool:
+    result = await db.locks.update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)}}
+    )
+    return result.matched_count == 1
+
+async def release_lease(name: str, owner: str):
+    await db.locks.delete_one({"_id": name, "owner": owner})
+
+# Write-behind course counters
+#
+# Enrollment and rating deltas accumulate in memory and are flushed as bulk
+# $inc updates every COUNTER_FLUSH_SECONDS. A reconciliation pass recounts the
+# enrollments and course_ratings collections to correct drift (lost deltas from
+# a crashed worker, writes made outside the API). Other workers may hold deltas
+# for writes already visible in those collections, so drift is only corrected
+# when it is unchanged after COUNTER_RECONCILE_SETTLE_SECONDS, and is applied
+# with $inc so those pending deltas still land. One worker across all hosts
+# reconciles at a time, under a lease.
+COUNTER_FLUSH_SECONDS = float(os.environ.get('COUNTER_FLUSH_SECONDS', '5'))
+COUNTER_RECONCILE_SECONDS = float(os.environ.get('COUNTER_RECONCILE_SECONDS', '3600'))
+COUNTER_RECONCILE_SETTLE_SECONDS = float(os.environ.get('COUNTER_RECONCILE_SETTLE_SECONDS', str(COUNTER_FLUSH_SECONDS * 3)))
+COUNTER_RECONCILE_LEASE_SECONDS = float(os.environ.get('COUNTER_RECONCILE_LEASE_SECONDS', str(COUNTER_RECONCILE_SETTLE_SECONDS + 300)))
+
+class CourseCounters:
+    """Accumulates course counter deltas and writes them behind in bulk"""
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._indexes_ready = False
+
+    def _delta(self, course_id: str) -> Dict[str, int]:
+        return self._pending.setdefault(course_id, {"enrollment_count": 0, "rating_total": 0, "rating_count": 0})
+
+    def record_enrollment(self, course_id: str, delta: int = 1):
+        self._delta(course_id)["enrollment_count"] += delta
+
+    def record_rating(self, course_id: str, rating_delta: int, count_delta: int):
+        delta = self._delta(course_id)
+        delta["rating_total"] += rating_delta
+        delta["rating_count"] += count_delta
+
+    async def flush(self):
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        operations = []
+        increment_ops = []
+        for course_id, delta in pending.items():
+            increments = {field: value for field, value in delta.items() if value}
+            if not increments:
+                continue
+            increment_ops.append((len(operations), course_id))
+            operations.append(UpdateOne({"id": course_id}, {"$inc": increments}))
+            if "rating_total" in increments or "rating_count" in increments:
+                operations.append(UpdateOne({"id": course_id}, [{"$set": {"average_rating": {"$cond": [
+                    {"$gt": ["$rating_count", 0]},
+                    {"$round": [{"$divide": ["$rating_total", "$rating_count"]}, 2]},
+                    0.0
+                ]}}}]))
+        if not operations:
+            return
+        try:
+            await db.courses.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            # An ordered batch stops at the first error: everything before it was
+            # applied, and the deltas from the failed operation on were not
+            failed_at = e.details["writeErrors"][0]["index"]
+            unapplied = [course_id for index, course_id in increment_ops if index >= failed_at]
+            logger.exception(f"Course counter flush stopped at operation {failed_at}; retrying {len(unapplied)} courses")
+            self._requeue({course_id: pending[course_id] for course_id in unapplied})
+            if failed_at:
+                cache_bus.publish("courses:*")
+            return
+        except Exception:
+            logger.exception("Course counter flush failed; deltas will be retried")
+            self._requeue(pending)
+            return
+        cache_bus.publish("courses:*")
+
+    def _requeue(self, pending: Dict[str, Dict[str, int]]):
+        for course_id, delta in pending.items():
+            for field, value in delta.items():
+                self._delta(course_id)[field] += value
+
+    async def ensure_indexes(self):
+        if not self._indexes_ready:
+            await db.enrollments.create_index([("student_id", 1), ("course_id", 1)], unique=True)
+            await db.course_ratings.create_index([("student_id", 1), ("course_id", 1)], unique=True)
+            self._indexes_ready = True
+
+    async def _drift(self, course_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Stored counter minus recounted value, per course that disagrees"""
+        match = [{"$match": {"course_id": {"$in": course_ids}}}] if course_ids is not None else []
+        enrollment_counts = {
+            row["_id"]: row["count"]
+            for row in await db.enrollments.aggregate(match + [
+                {"$group": {"_id": "$course_id", "count": {"$sum": 1}}}
+            ]).to_list(None)
+        }
+        rating_totals = {
+            row["_id"]: row
+            for row in await db.course_ratings.aggregate(match + [
+                {"$group": {"_id": "$course_id", "total": {"$sum": "$rating"}, "count": {"$sum": 1}}}
+            ]).to_list(None)
+        }
+        query = {"id": {"$in": course_ids}} if course_ids is not None else {}
+        drift = {}
+        async for course in db.courses.find(query, {"id": 1, "enrollment_count": 1, "rating_total": 1, "rating_count": 1}):
+            ratings = rating_totals.get(course["id"], {"total": 0, "count": 0})
+            expected = {
+                "enrollment_count": enrollment_counts.get(course["id"], 0),
+                "rating_total": ratings["total"],
+                "rating_count": ratings["count"]
+            }
+            offsets = {field: course.get(field, 0) - value for field, value in expected.items() if course.get(field, 0) != value}
+            if offsets:
+                drift[course["id"]] = offsets
+        return drift
+
+    async def reconcile(self):
+        """Correct counter drift that persists across a settle window; one worker cluster-wide at a time"""
+        from pymongo import UpdateOne
+
+        await self.ensure_indexes()
+        lease = await acquire_lease("course_counter_reconcile", COUNTER_RECONCILE_LEASE_SECONDS)
+        if lease is None:
+            return
+        try:
+            await self.flush()
+            suspects = await self._drift()
+            if not suspects:
+                return
+            # In-flight deltas from other workers are flushed within the settle window and change the offset
+            await asyncio.sleep(COUNTER_RECONCILE_SETTLE_SECONDS)
+            await self.flush()
+            confirmed = {
+                course_id: offsets
+                for course_id, offsets in (await self._drift(list(suspects))).items()
+                if suspects.get(course_id) == offsets
+            }
+            operations = []
+            for course_id, offsets in confirmed.items():
+                operations.append(UpdateOne({"id": course_id}, {"$inc": {field: -offset for field, offset in offsets.items()}}))
+                if "rating_total" in offsets or "rating_count" in offsets:
+                    operations.append(UpdateOne({"id": course_id}, [{"$set": {"average_rating": {"$cond": [
+                        {"$gt": ["$rating_count", 0]},
+                        {"$round": [{"$divide": ["$rating_total", "$rating_count"]}, 2]},
+                        0.0
+                    ]}}}]))
+            if not operations:
+                return
+            if not await renew_lease("course_counter_reconcile", lease, COUNTER_RECONCILE_LEASE_SECONDS):
+                # Another worker took over after our lease expired; it will recount
+                logger.warning("Course counter reconciliation lost its lease; skipping corrections")
+                return
+            await db.courses.bulk_write(operations, ordered=True)
+            cache_bus.publish("courses:*")
+            logger.info(f"Course counter reconciliation corrected {len(confirmed)} courses")
+        finally:
+            await release_lease("course_counter_reconcile", lease)
+
+course_counters = CourseCounters()
+
+class CourseRating(BaseModel):
+    rating: int = Field(ge=1, le=5)
+
 # Course Routes  
 @api_router.post("/courses", response_model=Course)
 async def create_course(course: CourseCreate, current_user: User = Depends(get_current_teacher), request: Request = None):
     course_obj = Course(**course.dict(), created_by=current_user.id)
     await db.courses.insert_one(course_obj.dict())
+    cache_bus.publish("courses:*", f"analytics:teacher:{current_user.id}")
     
     await log_activity(
         current_user.id,
@@ -540,15 +998,839 @@ async def get_courses(
     if published_only:
         query["is_published"] = True
     
-    courses = await db.courses.find(query).to_list(100)
+    cache_key = "courses:" + json.dumps(query, sort_keys=True)
+    courses = catalog_cache.get(cache_key)
+    if courses is None:
+        courses = await db.courses.find(query).to_list(100)
+        catalog_cache.set(cache_key, courses)
     return courses
 
-# Analytics Routes
-@api_router.get("/analytics/students")
-async def get_students_analytics(current_user: User = Depends(get_current_teacher)):
-    """Get detailed student analytics for the unified platform"""
+COURSE_CARD_FIELDS = [
+    "id", "title", "description", "learning_level", "skill_areas", "age_group", "thumbnail_url",
+    "is_premium", "difficulty_level", "estimated_hours", "enrollment_count", "average_rating"
+]
+
+async def get_course_cards(query: Dict[str, Any], limit: int = 100) -> List[Dict[str, Any]]:
+    """Compact course summaries for listings, cached with the catalog"""
+    cache_key = "courses:cards:" + json.dumps(query, sort_keys=True)
+    cards = catalog_cache.get(cache_key)
+    if cards is None:
+        projection = {field: 1 for field in COURSE_CARD_FIELDS}
+        projection.update(_id=0, video_count={"$size": {"$ifNull": ["$videos", []]}})
+        cards = await db.courses.aggregate([
+            {"$match": query},
+            {"$limit": limit},
+            {"$project": projection}
+        ]).to_list(limit)
+        catalog_cache.set(cache_key, cards)
+    return cards
+
+# Dashboard
+@api_router.get("/dashboard")
+async def get_dashboard(current_user: User = Depends(get_current_user)):
+    """Everything the dashboard needs for first paint in one round trip"""
+    is_student = current_user.role == UserRole.STUDENT
+    course_query = {"is_published": True}
+    if current_user.learning_level:
+        course_query["learning_level"] = current_user.learning_level.value
+
+    async def no_result(default):
+        return default
+
+    learning_path, enrollments, courses = await asyncio.gather(
+        ensure_learning_path(current_user) if is_student else no_result(None),
+        db.enrollments.find({"student_id": current_user.id}, {"_id": 0}).to_list(1000) if is_student else no_result([]),
+        get_course_cards(course_query)
+    )
+    if learning_path:
+        level = learning_path["learning_level"]
+    else:
+        level = current_user.learning_level.value if current_user.learning_level else "foundation"
+    
+    return {
+        "user": current_user,
+        "framework": LEARNING_FRAMEWORK.get(level, LEARNING_FRAMEWORK["foundation"]),
+        "learning_path": learning_path,
+        "enrollments": enrollments,
+        "courses": courses,
+        "stats": {"courses": len(courses), "enrollments": len(enrollments)}
+    }
+
+@api_router.post("/courses/{course_id}/enroll")
+async def enroll_in_course(course_id: str, current_user: User = Depends(get_current_user), request: Request = None):
+    from pymongo.errors import DuplicateKeyError
+
+    if current_user.role != UserRole.STUDENT:
+        raise HTTPException(status_code=403, detail="Only students can enroll in courses")
+    course = await db.courses.find_one({"id": course_id}, {"id": 1, "title": 1})
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if await db.enrollments.find_one({"student_id": current_user.id, "course_id": course_id}, {"_id": 1}):
+        raise HTTPException(status_code=400, detail="Already enrolled in this course")
+    
+    enrollment = {
+        "id": str(uuid.uuid4()),
+        "student_id": current_user.id,
+        "course_id": course_id,
+        "enrolled_at": datetime.utcnow()
+    }
+    try:
+        await db.enrollments.insert_one(enrollment)
+    except DuplicateKeyError:
+        # A concurrent request enrolled first
+        raise HTTPException(status_code=400, detail="Already enrolled in this course")
+    course_counters.record_enrollment(course_id)
+    cache_bus.publish(f"analytics:course:{course_id}")
+    
+    await log_activity(
+        current_user.id,
+        ActivityType.COURSE_ENROLLMENT,
+        {"course_id": course_id, "course_title": course["title"]},
+        request
+    )
+    
+    return {"message": "Enrolled successfully", "enrollment_id": enrollment["id"]}
+
+@api_router.post("/courses/{course_id}/rate")
+async def rate_course(course_id: str, rating: CourseRating, current_user: User = Depends(get_current_user)):
+    from pymongo import ReturnDocument
+
+    if not await db.enrollments.find_one({"student_id": current_user.id, "course_id": course_id}, {"_id": 1}):
+        raise HTTPException(status_code=403, detail="Enroll in the course before rating it")
+    
+    previous = await db.course_ratings.find_one_and_update(
+        {"student_id": current_user.id, "course_id": course_id},
+        {"$set": {"rating": rating.rating, "rated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous:
+        course_counters.record_rating(course_id, rating.rating - previous["rating"], 0)
+    else:
+        course_counters.record_rating(course_id, rating.rating, 1)
+    
+    return {"message": "Rating saved", "rating": rating.rating}
+
+# Activity log retention
+#
+# Events stay in Mongo for ACTIVITY_HOT_DAYS. Older events are moved, oldest
+# first, into gzip JSONL segment files under ACTIVITY_ARCHIVE_DIR and then
+# deleted from Mongo. index.json lists every segment with its time range and
+# the users it contains, so historical lookups only open relevant segments.
+ACTIVITY_HOT_DAYS = int(os.environ.get('ACTIVITY_HOT_DAYS', '30'))
+ACTIVITY_ARCHIVE_DIR = Path(os.environ.get('ACTIVITY_ARCHIVE_DIR', str(ROOT_DIR / "archive" / "activity_logs")))
+ACTIVITY_ARCHIVE_BATCH_SIZE = int(os.environ.get('ACTIVITY_ARCHIVE_BATCH_SIZE', '5000'))
+ACTIVITY_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ACTIVITY_ARCHIVE_INTERVAL_SECONDS', '3600'))
+
+class ActivityArchive:
+    """Archives cold activity_logs to compressed segments and reads them back"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.index_path = directory / "index.json"
+        self._segments: List[Dict[str, Any]] = []
+        self._index_signature: Optional[tuple] = None
+        self._indexes_ready = False
+
+    def _index_stat(self) -> Optional[tuple]:
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_index(self) -> List[Dict[str, Any]]:
+        """Return the segment index, re-reading it whenever another worker has rewritten it"""
+        signature = self._index_stat()
+        if signature != self._index_signature:
+            self._segments = json.loads(self.index_path.read_text())["segments"] if signature else []
+            self._index_signature = signature
+        return self._segments
+
+    def _write_segment(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        start, end = events[0]["timestamp"], events[-1]["timestamp"]
+        name = f"activity-{start:%Y%m%dT%H%M%S}-{events[0]['id'][:8]}.jsonl.gz"
+        with gzip.open(self.directory / name, "wt", encoding="utf-8") as segment:
+            for event in events:
+                segment.write(json.dumps(event, default=lambda value: value.isoformat()) + "\n")
+        entry = {
+            "file": name,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "count": len(events),
+            "users": sorted({event["user_id"] for event in events})
+        }
+        segments = self._load_index() + [entry]
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"segments": segments}))
+        os.replace(tmp_path, self.index_path)
+        self._segments, self._index_signature = segments, self._index_stat()
+        return entry
+
+    def _read_segments(self, user_id: str, start: Optional[datetime], end: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+        events = []
+        for entry in sorted(self._load_index(), key=lambda e: e["end"], reverse=True):
+            if len(events) >= limit:
+                break
+            if (start and datetime.fromisoformat(entry["end"]) < start) or (end and datetime.fromisoformat(entry["start"]) > end):
+                continue
+            if user_id not in entry["users"]:
+                continue
+            matched = []
+            with gzip.open(self.directory / entry["file"], "rt", encoding="utf-8") as segment:
+                for line in segment:
+                    event = json.loads(line)
+                    if event["user_id"] != user_id:
+                        continue
+                    event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                    if (start and event["timestamp"] < start) or (end and event["timestamp"] > end):
+                        continue
+                    matched.append(event)
+            events.extend(reversed(matched))
+        return events
+
+    async def ensure_indexes(self):
+        if not self._indexes_ready:
+            await db.activity_logs.create_index([("user_id", 1), ("timestamp", -1)])
+            await db.activity_logs.create_index("timestamp")
+            self._indexes_ready = True
+
+    async def archive_cold_events(self):
+        """Move events older than the hot window to segments; one worker per host at a time"""
+        await self.ensure_indexes()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            cutoff = datetime.utcnow() - timedelta(days=ACTIVITY_HOT_DAYS)
+            archived = 0
+            while True:
+                events = await db.activity_logs.find(
+                    {"timestamp": {"$lt": cutoff}}, {"_id": 0}
+                ).sort("timestamp", 1).limit(ACTIVITY_ARCHIVE_BATCH_SIZE).to_list(ACTIVITY_ARCHIVE_BATCH_SIZE)
+                if not events:
+                    break
+                await asyncio.to_thread(self._write_segment, events)
+                await db.activity_logs.delete_many({"id": {"$in": [event["id"] for event in events]}})
+                archived += len(events)
+            if archived:
+                logger.info(f"Archived {archived} activity events older than {cutoff.isoformat()}")
+
+    async def query(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest-first events for a user across Mongo and archived segments"""
+        # Stored timestamps are naive UTC
+        if start and start.tzinfo:
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        if end and end.tzinfo:
+            end = end.astimezone(timezone.utc).replace(tzinfo=None)
+        query = {"user_id": user_id}
+        if start or end:
+            query["timestamp"] = {}
+            if start:
+                query["timestamp"]["$gte"] = start
+            if end:
+                query["timestamp"]["$lte"] = end
+        events = await db.activity_logs.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
+        hot_cutoff = datetime.utcnow() - timedelta(days=ACTIVITY_HOT_DAYS)
+        if len(events) < limit and (start is None or start < hot_cutoff):
+            archived = await asyncio.to_thread(self._read_segments, user_id, start, end, limit - len(events))
+            # A crash between writing a segment and deleting it from Mongo can leave duplicates
+            seen_ids = {event["id"] for event in events}
+            events.extend(event for event in archived if event["id"] not in seen_ids)
+        return events[:limit]
+
+activity_archive = ActivityArchive(ACTIVITY_ARCHIVE_DIR)
+
+@api_router.get("/analytics/activity/{user_id}")
+async def get_activity_history(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_teacher)
+):
+    """Get a user's activity history, including archived events"""
+    if current_user.role == UserRole.TEACHER:
+        # Teachers only see students enrolled in their courses
+        teacher_courses = await db.courses.find({"created_by": current_user.id}, {"id": 1}).to_list(1000)
+        enrolled = await db.enrollments.find_one(
+            {"student_id": user_id, "course_id": {"$in": [course["id"] for course in teacher_courses]}},
+            {"_id": 1}
+        )
+        if not enrolled:
+            raise HTTPException(status_code=403, detail="Student is not enrolled in your courses")
+    return await activity_archive.query(user_id, start, end, limit)
+
+# Video Watch Progress
+#
+# Players send a heartbeat every VIDEO_HEARTBEAT_INTERVAL_SECONDS with their
+# position. Each beat marks the fixed-size buckets it covers as watched, so
+# duplicate and out-of-order beats merge naturally. The viewer must be enrolled
+# and the video must belong to the course. Its duration is pinned on first
+# sight; a duration only the client vouches for is raised to at least
+# VIDEO_MIN_CLIENT_DURATION_SECONDS. Coverage and watch time are capped by the
+# wall-clock time between beats. Progress is written to
+# Mongo once per VIDEO_PROGRESS_FLUSH_SECONDS, or immediately when the viewer
+# nears the end, with watched buckets merged by $addToSet across workers.
+VIDEO_HEARTBEAT_INTERVAL_SECONDS = float(os.environ.get('VIDEO_HEARTBEAT_INTERVAL_SECONDS', '10'))
+VIDEO_PROGRESS_FLUSH_SECONDS = float(os.environ.get('VIDEO_PROGRESS_FLUSH_SECONDS', '15'))
+VIDEO_COMPLETION_THRESHOLD = float(os.environ.get('VIDEO_COMPLETION_THRESHOLD', '0.9'))
+VIDEO_MIN_CLIENT_DURATION_SECONDS = float(os.environ.get('VIDEO_MIN_CLIENT_DURATION_SECONDS', '30'))
+VIDEO_BUCKET_SECONDS = 5
+VIDEO_PROGRESS_IDLE_SECONDS = 600
+
+class VideoHeartbeat(BaseModel):
+    course_id: str
+    video_id: str
+    position_seconds: float = Field(ge=0)
+    duration_seconds: float = Field(gt=0)
+
+class VideoProgressTracker:
+    """Coalesces per-user, per-video heartbeats in memory"""
+
+    def __init__(self):
+        self._states: Dict[tuple, Dict[str, Any]] = {}
+        self._pending_seconds: Dict[str, float] = {}
+        self._user_credited_at: Dict[str, float] = {}
+
+    @staticmethod
+    def _total_buckets(duration_seconds: float) -> int:
+        return max(1, math.ceil(duration_seconds / VIDEO_BUCKET_SECONDS))
+
+    async def _open_state(self, user_id: str, beat: VideoHeartbeat) -> Dict[str, Any]:
+        """Validate the viewer and video, and pin the video's duration on first sight"""
+        course, enrollment, stored = await asyncio.gather(
+            db.courses.find_one(
+                {"id": beat.course_id, "videos.id": beat.video_id},
+                {"_id": 0, "videos": {"$elemMatch": {"id": beat.video_id}}}
+            ),
+            db.enrollments.find_one({"student_id": user_id, "course_id": beat.course_id}, {"_id": 1}),
+            db.video_progress.find_one(
+                {"user_id": user_id, "video_id": beat.video_id}, {"_id": 0, "duration_seconds": 1, "completed": 1}
+            )
+        )
+        if not course:
+            raise HTTPException(status_code=404, detail="Video not found in this course")
+        if not enrollment:
+            raise HTTPException(status_code=403, detail="Enroll in the course to track video progress")
+        video = course["videos"][0]
+        if video.get("duration_seconds"):
+            duration = video["duration_seconds"]
+        else:
+            # Client-reported (now or by an earlier session): a tiny duration would make one beat a full watch
+            client_duration = (stored or {}).get("duration_seconds") or beat.duration_seconds
+            duration = max(client_duration, VIDEO_MIN_CLIENT_DURATION_SECONDS)
+        return self._new_state(beat.course_id, duration, bool(stored and stored.get("completed")))
+
+    @staticmethod
+    def _new_state(course_id: str, duration_seconds: float, completed: bool) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "course_id": course_id,
+            "duration_seconds": duration_seconds,
+            "buckets": set(),
+            "new_buckets": set(),
+            "max_position": 0.0,
+            "completed": completed,
+            "last_seen": now,
+            # Lets the first beat cover [0, position] when players start beating one interval in
+            "credited_at": now - VIDEO_HEARTBEAT_INTERVAL_SECONDS - VIDEO_BUCKET_SECONDS
+        }
+
+    async def record(self, user_id: str, beat: VideoHeartbeat) -> Dict[str, Any]:
+        key = (user_id, beat.video_id)
+        state = self._states.get(key)
+        if state is None:
+            state = await self._open_state(user_id, beat)
+            state = self._states.setdefault(key, state)
+        now = time.monotonic()
+        state["last_seen"] = now
+        position = min(beat.position_seconds, state["duration_seconds"])
+        state["max_position"] = max(state["max_position"], position)
+
+        # A beat can only add as much coverage as wall-clock time has passed
+        # since coverage was last credited (plus one bucket of jitter). Rounding
+        # is carried over in credited_at, so it never accumulates.
+        window = VIDEO_HEARTBEAT_INTERVAL_SECONDS + VIDEO_BUCKET_SECONDS
+        elapsed = min(now - state["credited_at"], window)
+        allowance = int(elapsed / VIDEO_BUCKET_SECONDS + 0.5)
+        # Credit the buckets played up to the current position, not the one starting at it
+        first = int(max(0.0, position - window) // VIDEO_BUCKET_SECONDS)
+        last = min(math.ceil(position / VIDEO_BUCKET_SECONDS) - 1, self._total_buckets(state["duration_seconds"]) - 1)
+        covered = sorted(set(range(first, last + 1)) - state["buckets"], reverse=True)[:allowance]
+        if covered:
+            state["credited_at"] = now - (elapsed - len(covered) * VIDEO_BUCKET_SECONDS)
+            state["buckets"].update(covered)
+            state["new_buckets"].update(covered)
+            self._credit_watch_time(user_id, len(covered) * VIDEO_BUCKET_SECONDS, now)
+
+        coverage = len(state["buckets"]) / self._total_buckets(state["duration_seconds"])
+        return {
+            "video_id": beat.video_id,
+            "watched_percentage": round(100 * coverage, 1),
+            "completed": state["completed"],
+            "crossed_threshold": not state["completed"] and coverage >= VIDEO_COMPLETION_THRESHOLD
+        }
+
+    def _credit_watch_time(self, user_id: str, seconds: float, now: float):
+        """Credit at most the wall-clock time since the user's last credit, across all their videos"""
+        last_credit = self._user_credited_at.get(user_id, now - VIDEO_HEARTBEAT_INTERVAL_SECONDS)
+        elapsed = min(now - last_credit, VIDEO_HEARTBEAT_INTERVAL_SECONDS + VIDEO_BUCKET_SECONDS)
+        credited = min(seconds, elapsed)
+        self._user_credited_at[user_id] = now - (elapsed - credited)
+        self._pending_seconds[user_id] = self._pending_seconds.get(user_id, 0) + credited
+
+    def is_completed(self, user_id: str, video_id: str) -> bool:
+        state = self._states.get((user_id, video_id))
+        return bool(state and state["completed"])
+
+    async def flush(self, keys: Optional[List[tuple]] = None):
+        from pymongo import UpdateOne
+
+        keys = [key for key in (keys if keys is not None else list(self._states)) if key in self._states]
+        dirty = [key for key in keys if self._states[key]["new_buckets"]]
+        if dirty:
+            now = datetime.utcnow()
+            operations = []
+            sent_buckets = []
+            for user_id, video_id in dirty:
+                state = self._states[(user_id, video_id)]
+                sent_buckets.append(set(state["new_buckets"]))
+                operations.append(UpdateOne(
+                    {"user_id": user_id, "video_id": video_id},
+                    {
+                        "$addToSet": {"watched_buckets": {"$each": sorted(sent_buckets[-1])}},
+                        "$max": {"last_position": state["max_position"]},
+                        "$set": {"course_id": state["course_id"], "updated_at": now},
+                        "$setOnInsert": {
+                            "id": str(uuid.uuid4()),
+                            "duration_seconds": state["duration_seconds"],
+                            "completed": False,
+                            "started_at": now
+                        }
+                    },
+                    upsert=True
+                ))
+            try:
+                result = await db.video_progress.bulk_write(operations, ordered=False)
+            except Exception:
+                # $addToSet/$max are idempotent, so the whole batch is simply resent next time
+                logger.exception("Video progress flush failed; progress will be retried")
+                return
+            # Only clear what was written; beats may have arrived during the write
+            for key, buckets in zip(dirty, sent_buckets):
+                self._states[key]["new_buckets"] -= buckets
+            for index in result.upserted_ids:
+                user_id, video_id = dirty[index]
+                await log_activity(user_id, ActivityType.VIDEO_WATCHED, {
+                    "video_id": video_id, "course_id": self._states[(user_id, video_id)]["course_id"]
+                })
+
+        await self._flush_watch_time([user_id for user_id, _ in keys])
+        for key in keys:
+            state = self._states[key]
+            if not state["completed"] and state["max_position"] >= VIDEO_COMPLETION_THRESHOLD * state["duration_seconds"]:
+                try:
+                    await self._check_completion(key, state)
+                except Exception:
+                    logger.exception(f"Video completion check failed for {key}; will retry on next flush")
+
+        idle_before = time.monotonic() - VIDEO_PROGRESS_IDLE_SECONDS
+        for key in keys:
+            state = self._states[key]
+            if state["last_seen"] < idle_before and not state["new_buckets"]:
+                del self._states[key]
+        active_users = {user_id for user_id, _ in self._states}
+        for user_id in [user_id for user_id in self._pending_seconds if user_id not in active_users]:
+            # Drop the sub-minute remainder of viewers who have gone idle
+            del self._pending_seconds[user_id]
+        for user_id in [user_id for user_id in self._user_credited_at if user_id not in active_users]:
+            del self._user_credited_at[user_id]
+
+    async def _flush_watch_time(self, user_ids: List[str]):
+        """Add whole minutes to total_watch_time; carry the remainder over"""
+        for user_id in set(user_ids):
+            seconds = self._pending_seconds.get(user_id, 0)
+            minutes = int(seconds // 60)
+            if not minutes:
+                continue
+            self._pending_seconds[user_id] = seconds - minutes * 60
+            try:
+                await db.users.update_one({"id": user_id}, {"$inc": {"total_watch_time": minutes}})
+            except Exception:
+                logger.exception(f"Watch time flush failed for {user_id}; will retry")
+                self._pending_seconds[user_id] = self._pending_seconds.get(user_id, 0) + minutes * 60
+                continue
+            try:
+                await db.learning_paths.update_one(
+                    {"student_id": user_id},
+                    {"$inc": {"total_learning_time": minutes}, "$set": {"last_updated": datetime.utcnow()}}
+                )
+            except Exception:
+                # Not retried: total_watch_time was already credited with these minutes
+                logger.exception(f"Learning time flush failed for {user_id}")
+            invalidate_user(user_id)
+            publish_learning_path_change(user_id)
+
+    async def _check_completion(self, key: tuple, state: Dict[str, Any]):
+        """Mark completion once across all workers, using the merged buckets in Mongo"""
+        user_id, video_id = key
+        required = math.ceil(VIDEO_COMPLETION_THRESHOLD * self._total_buckets(state["duration_seconds"]))
+        completed = await db.video_progress.find_one_and_update(
+            {
+                "user_id": user_id,
+                "video_id": video_id,
+                "completed": False,
+                "$expr": {"$gte": [{"$size": "$watched_buckets"}, required]}
+            },
+            {"$set": {"completed": True, "completed_at": datetime.utcnow()}}
+        )
+        if completed:
+            state["completed"] = True
+            await log_activity(user_id, ActivityType.VIDEO_COMPLETED, {
+                "video_id": video_id, "course_id": state["course_id"]
+            })
+        elif await db.video_progress.count_documents({"user_id": user_id, "video_id": video_id, "completed": True}, limit=1):
+            state["completed"] = True
+
+video_progress = VideoProgressTracker()
+
+@api_router.post("/videos/heartbeat")
+async def record_video_heartbeat(beat: VideoHeartbeat, current_user: User = Depends(get_current_user)):
+    """Record player progress; consolidated writes happen in the background"""
+    progress = await video_progress.record(current_user.id, beat)
+    if progress.pop("crossed_threshold"):
+        await video_progress.flush([(current_user.id, beat.video_id)])
+        progress["completed"] = video_progress.is_completed(current_user.id, beat.video_id)
+    return progress
+
+# Leaderboards
+#
+# Weekly "top learners" boards per age group: an overall board ranked by
+# total_learning_time (skill progress breaks ties) and one board per skill
+# area ranked by that skill's progress (learning time breaks ties). Students
+# whose learning path was updated this ISO week are ranked. Boards live in
+# memory as indexable skip lists. They are seeded by the first refresh after
+# startup, kept current from "leaderboard:student:<id>" bus events, and
+# snapshotted to disk so restarts only catch up recent changes instead of
+# rescanning learning_paths.
+LEADERBOARD_REFRESH_SECONDS = float(os.environ.get('LEADERBOARD_REFRESH_SECONDS', '1'))
+LEADERBOARD_SNAPSHOT_SECONDS = float(os.environ.get('LEADERBOARD_SNAPSHOT_SECONDS', '300'))
+LEADERBOARD_SNAPSHOT_PATH = Path(os.environ.get('LEADERBOARD_SNAPSHOT_PATH', str(ROOT_DIR / "snapshots" / "leaderboards.json")))
+OVERALL_BOARD = "overall"
+
+class _SkipNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        self.width = [1] * level
+
+class RankedSet:
+    """Indexable skip list of members ordered by descending score tuple
+
+    upsert, discard and rank are O(log n); top(k) is O(k).
+    """
+
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self._head = _SkipNode(None, self.MAX_LEVEL)
+        self._keys: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _sort_key(member: str, score: tuple) -> tuple:
+        return tuple(-value for value in score) + (member,)
+
+    @classmethod
+    def _random_level(cls) -> int:
+        level = 1
+        while level < cls.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def upsert(self, member: str, score: tuple):
+        key = self._sort_key(member, score)
+        if self._keys.get(member) == key:
+            return
+        self.discard(member)
+        self._keys[member] = key
+
+        update = [None] * self.MAX_LEVEL
+        rank_at = [0] * self.MAX_LEVEL
+        node, rank = self._head, 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                rank += node.width[i]
+                node = node.next[i]
+            update[i], rank_at[i] = node, rank
+
+        level = self._random_level()
+        new = _SkipNode(key, level)
+        for i in range(level):
+            previous = update[i]
+            new.next[i] = previous.next[i]
+            previous.next[i] = new
+            new.width[i] = previous.width[i] - (rank - rank_at[i])
+            previous.width[i] = rank - rank_at[i] + 1
+        for i in range(level, self.MAX_LEVEL):
+            update[i].width[i] += 1
+
+    def discard(self, member: str):
+        key = self._keys.pop(member, None)
+        if key is None:
+            return
+        update = [None] * self.MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+        target = update[0].next[0]
+        for i in range(self.MAX_LEVEL):
+            previous = update[i]
+            if previous.next[i] is target:
+                previous.width[i] += target.width[i] - 1
+                previous.next[i] = target.next[i]
+            else:
+                previous.width[i] -= 1
+
+    def rank(self, member: str) -> Optional[int]:
+        """1-based rank, or None if the member is not on the board"""
+        key = self._keys.get(member)
+        if key is None:
+            return None
+        node, rank = self._head, 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                rank += node.width[i]
+                node = node.next[i]
+        return rank
+
+    def top(self, k: int) -> List[tuple]:
+        """[(member, score)] for the k best members"""
+        entries = []
+        node = self._head.next[0]
+        while node is not None and len(entries) < k:
+            entries.append((node.key[-1], tuple(-value for value in node.key[:-1])))
+            node = node.next[0]
+        return entries
+
+class LeaderboardService:
+    """Weekly per-age-group and per-skill leaderboards"""
+
+    AGE_GROUP_BY_LEVEL = {
+        LearningLevel.FOUNDATION.value: AgeGroup.FOUNDATION.value,
+        LearningLevel.DEVELOPMENT.value: AgeGroup.DEVELOPMENT.value,
+        LearningLevel.MASTERY.value: AgeGroup.MASTERY.value
+    }
+
+    def __init__(self, snapshot_path: Path):
+        self.snapshot_path = snapshot_path
+        self.week: Optional[str] = None
+        self._boards: Dict[tuple, RankedSet] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+
+    @staticmethod
+    def current_week() -> tuple:
+        """(ISO week label, naive UTC start of the week)"""
+        now = datetime.utcnow()
+        year, week, weekday = now.isocalendar()
+        start = (now - timedelta(days=weekday - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return f"{year}-W{week:02d}", start
+
+    def board(self, age_group: str, skill_area: Optional[str] = None) -> RankedSet:
+        return self._boards.setdefault((age_group, skill_area or OVERALL_BOARD), RankedSet())
+
+    def _record_from_path(self, path: Dict[str, Any], full_name: Optional[str]) -> Dict[str, Any]:
+        return {
+            "age_group": self.AGE_GROUP_BY_LEVEL.get(path.get("learning_level"), AgeGroup.FOUNDATION.value),
+            "skill_progress": dict(path.get("skill_progress") or {}),
+            "total_learning_time": path.get("total_learning_time", 0),
+            "full_name": full_name,
+            "last_updated": path["last_updated"].isoformat() if path.get("last_updated") else None
+        }
+
+    def _apply(self, student_id: str, record: Optional[Dict[str, Any]]):
+        previous = self._records.pop(student_id, None)
+        if previous is not None:
+            self.board(previous["age_group"]).discard(student_id)
+            for skill in SkillArea:
+                self.board(previous["age_group"], skill.value).discard(student_id)
+        if record is None:
+            return
+        self._records[student_id] = record
+        skills = record["skill_progress"]
+        learning_time = record["total_learning_time"]
+        self.board(record["age_group"]).upsert(student_id, (learning_time, sum(skills.values())))
+        for skill in SkillArea:
+            self.board(record["age_group"], skill.value).upsert(student_id, (skills.get(skill.value, 0), learning_time))
+
+    async def _load_paths(self, query: Dict[str, Any], week_start: datetime, student_ids: Optional[List[str]] = None):
+        seen = set()
+        async for path in db.learning_paths.find(query, {"_id": 0}):
+            seen.add(path["student_id"])
+            if path.get("last_updated") and path["last_updated"] >= week_start:
+                self._apply(path["student_id"], self._record_from_path(path, None))
+            else:
+                self._apply(path["student_id"], None)
+        for student_id in (student_ids or []):
+            if student_id not in seen:
+                self._apply(student_id, None)
+        missing_names = [sid for sid in seen if sid in self._records and self._records[sid]["full_name"] is None]
+        for i in range(0, len(missing_names), 1000):
+            async for user in db.users.find({"id": {"$in": missing_names[i:i + 1000]}}, {"id": 1, "full_name": 1}):
+                self._records[user["id"]]["full_name"] = user["full_name"]
+
+    async def seed(self):
+        """Load the snapshot (if it is for this week) and catch up, else rescan this week"""
+        week, week_start = self.current_week()
+        self._boards, self._records = {}, {}
+        snapshot = None
+        if self.snapshot_path.exists():
+            snapshot = await asyncio.to_thread(lambda: json.loads(self.snapshot_path.read_text()))
+        if snapshot and snapshot["week"] == week:
+            for student_id, record in snapshot["records"].items():
+                self._apply(student_id, record)
+            # Overlap the catch-up window to cover writes racing the snapshot
+            since = datetime.fromisoformat(snapshot["taken_at"]) - timedelta(minutes=1)
+            await self._load_paths({"last_updated": {"$gte": max(since, week_start)}}, week_start)
+        else:
+            await self._load_paths({"last_updated": {"$gte": week_start}}, week_start)
+        self.week = week
+        logger.info(f"Leaderboards seeded for {week} with {len(self._records)} learners")
+
+    def on_invalidation(self, key: str):
+        self._dirty.add(key.rsplit(":", 1)[1])
+
+    async def refresh(self):
+        """Apply queued learning path changes; reseed when the week rolls over"""
+        week, week_start = self.current_week()
+        if week != self.week:
+            self._dirty.clear()
+            await self.seed()
+            return
+        if not self._dirty:
+            return
+        student_ids, self._dirty = list(self._dirty), set()
+        for i in range(0, len(student_ids), 1000):
+            chunk = student_ids[i:i + 1000]
+            for student_id in chunk:
+                if student_id in self._records:
+                    # Re-fetch the name too in case it changed
+                    self._records[student_id]["full_name"] = None
+            await self._load_paths({"student_id": {"$in": chunk}}, week_start, chunk)
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]):
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_name(f"{self.snapshot_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(snapshot))
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def snapshot(self):
+        if self.week is None:
+            return
+        snapshot = {"week": self.week, "taken_at": datetime.utcnow().isoformat(), "records": dict(self._records)}
+        await asyncio.to_thread(self._write_snapshot, snapshot)
+
+    def top(self, age_group: str, skill_area: Optional[str], k: int) -> List[Dict[str, Any]]:
+        entries = []
+        for rank, (student_id, score) in enumerate(self.board(age_group, skill_area).top(k), start=1):
+            entries.append({
+                "rank": rank,
+                "student_id": student_id,
+                "full_name": self._records[student_id]["full_name"],
+                "score": score[0],
+                "tiebreak": score[1]
+            })
+        return entries
+
+    def standing(self, student_id: str, skill_area: Optional[str]) -> Dict[str, Any]:
+        record = self._records.get(student_id)
+        if record is None:
+            return {"week": self.week, "rank": None, "total": None}
+        board = self.board(record["age_group"], skill_area)
+        return {
+            "week": self.week,
+            "age_group": record["age_group"],
+            "board": skill_area or OVERALL_BOARD,
+            "rank": board.rank(student_id),
+            "total": len(board)
+        }
+
+leaderboards = LeaderboardService(LEADERBOARD_SNAPSHOT_PATH)
+cache_bus.subscribe("leaderboard:student:", leaderboards.on_invalidation)
+
+def leaderboard_entries_for(viewer: User, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply viewer-specific visibility to leaderboard entries
+
+    Students only see display names (and which entry is their own); teachers
+    and admins also get student ids. Any name-privacy setting belongs here.
+    """
+    if viewer.role != UserRole.STUDENT:
+        return entries
+    return [
+        {
+            "rank": entry["rank"],
+            "full_name": entry["full_name"],
+            "score": entry["score"],
+            "tiebreak": entry["tiebreak"],
+            "is_me": entry["student_id"] == viewer.id
+        }
+        for entry in entries
+    ]
+
+@api_router.get("/leaderboards")
+async def get_leaderboard(
+    age_group: Optional[AgeGroup] = None,
+    skill_area: Optional[SkillArea] = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    """Get this week's top learners for an age group, overall or for one skill area"""
+    if current_user.role == UserRole.STUDENT:
+        # Students only see their own age group's boards
+        if current_user.age_group is None or (age_group and age_group != current_user.age_group):
+            raise HTTPException(status_code=403, detail="Students can only view their own age group's leaderboard")
+        age_group = current_user.age_group
+    elif age_group is None:
+        raise HTTPException(status_code=400, detail="age_group is required")
     
+    entries = leaderboards.top(age_group.value, skill_area.value if skill_area else None, min(limit, 100))
+    return {
+        "week": leaderboards.week,
+        "age_group": age_group.value,
+        "board": skill_area.value if skill_area else OVERALL_BOARD,
+        "entries": leaderboard_entries_for(current_user, entries)
+    }
+
+@api_router.get("/leaderboards/me")
+async def get_my_leaderboard_rank(skill_area: Optional[SkillArea] = None, current_user: User = Depends(get_current_user)):
+    """Get the current student's rank on their age group's board"""
+    return leaderboards.standing(current_user.id, skill_area.value if skill_area else None)
+
+# Analytics Routes
+#
+# Dashboard payloads are cached per teacher (all admins share one snapshot).
+# Enrollments, learning path updates and student activity publish
+# "analytics:course:<id>", "analytics:student:<id>" or "analytics:teacher:<id>"
+# on the cache bus. Affected snapshots are marked stale and served while a
+# background rebuild runs (stale-while-revalidate).
+ANALYTICS_SNAPSHOT_TTL_SECONDS = float(os.environ.get('ANALYTICS_SNAPSHOT_TTL_SECONDS', '300'))
+ADMIN_SNAPSHOT_KEY = "__admin__"
+
+async def build_students_analytics(current_user: User) -> Dict[str, Any]:
+    """Derive the student analytics payload plus the ids it depends on"""
     students = []
+    course_ids = []
     if current_user.role == UserRole.TEACHER:
         # Get students from teacher's courses
         teacher_courses = await db.courses.find({"created_by": current_user.id}).to_list(1000)
@@ -568,7 +1850,7 @@ async def get_students_analytics(current_user: User = Depends(get_current_teache
             
             # Get recent activities
             activities = await db.activity_logs.find(
-                {"user_id": student_id}
+                {"user_id": student_id}, {"_id": 0}
             ).sort("timestamp", -1).limit(5).to_list(5)
             
             students.append({
@@ -584,7 +1866,290 @@ async def get_students_analytics(current_user: User = Depends(get_current_teache
                 "recent_activities": activities
             })
     
-    return students
+    return {"students": students, "course_ids": course_ids, "student_ids": student_ids}
+
+class AnalyticsSnapshotCache:
+    """Per-teacher analytics snapshots with selective invalidation"""
+
+    def __init__(self):
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._teachers_by_student: Dict[str, set] = {}
+        self._teacher_by_course: Dict[str, str] = {}
+        self._rebuilds: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def key_for(user: User) -> str:
+        return user.id if user.role == UserRole.TEACHER else ADMIN_SNAPSHOT_KEY
+
+    async def get(self, user: User) -> List[Dict[str, Any]]:
+        key = self.key_for(user)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            return (await self._rebuild(key, user))["students"]
+        expired = time.monotonic() - snapshot["built_at"] > ANALYTICS_SNAPSHOT_TTL_SECONDS
+        if expired or snapshot["version"] != self._versions.get(key, 0):
+            self._rebuild(key, user)
+        return snapshot["students"]
+
+    def _rebuild(self, key: str, user: User) -> asyncio.Task:
+        """Start (or join) a rebuild of one snapshot"""
+        task = self._rebuilds.get(key)
+        if task is None:
+            task = create_untraced_task(self._build(key, user))
+            self._rebuilds[key] = task
+            task.add_done_callback(lambda done: self._finish_rebuild(key, done))
+        return task
+
+    def _finish_rebuild(self, key: str, task: asyncio.Task):
+        self._rebuilds.pop(key, None)
+        if not task.cancelled():
+            # Already logged in _build; retrieving it silences asyncio's warning
+            task.exception()
+
+    async def _build(self, key: str, user: User) -> Dict[str, Any]:
+        version = self._versions.get(key, 0)
+        try:
+            snapshot = await build_students_analytics(user)
+        except Exception:
+            logger.exception(f"Analytics snapshot rebuild failed for {key}")
+            raise
+        self._forget_dependencies(key)
+        snapshot.update(built_at=time.monotonic(), version=version)
+        self._snapshots[key] = snapshot
+        for course_id in snapshot["course_ids"]:
+            self._teacher_by_course[course_id] = key
+        for student_id in snapshot["student_ids"]:
+            self._teachers_by_student.setdefault(student_id, set()).add(key)
+        return snapshot
+
+    def _forget_dependencies(self, key: str):
+        previous = self._snapshots.get(key)
+        if previous is None:
+            return
+        for course_id in previous["course_ids"]:
+            self._teacher_by_course.pop(course_id, None)
+        for student_id in previous["student_ids"]:
+            teachers = self._teachers_by_student.get(student_id)
+            if teachers:
+                teachers.discard(key)
+                if not teachers:
+                    del self._teachers_by_student[student_id]
+
+    def mark_stale(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def on_invalidation(self, key: str):
+        kind, _, entity_id = key[len("analytics:"):].partition(":")
+        if kind == "teacher":
+            self.mark_stale(entity_id)
+        elif kind == "course":
+            teacher = self._teacher_by_course.get(entity_id)
+            if teacher:
+                self.mark_stale(teacher)
+            self.mark_stale(ADMIN_SNAPSHOT_KEY)
+        elif kind == "student":
+            for teacher in self._teachers_by_student.get(entity_id, ()):
+                self.mark_stale(teacher)
+            self.mark_stale(ADMIN_SNAPSHOT_KEY)
+
+analytics_snapshots = AnalyticsSnapshotCache()
+cache_bus.subscribe("analytics:", analytics_snapshots.on_invalidation)
+
+@api_router.get("/analytics/students")
+async def get_students_analytics(current_user: User = Depends(get_current_teacher)):
+    """Get detailed student analytics for the unified platform"""
+    return await analytics_snapshots.get(current_user)
+
+# Bulk Student Onboarding
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', '500'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# Every web worker owns a pool, so split the cores between them when the worker
+# count is known; a plain `uvicorn server:app` runs one worker and gets them all
+_default_hash_workers = os.cpu_count() or 1
+if 'WEB_CONCURRENCY' in os.environ:
+    _default_hash_workers = max(1, _default_hash_workers // WEB_CONCURRENCY)
+HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', _default_hash_workers))
+ROSTER_FIELDS = ("email", "full_name", "age_group", "password")
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+def _hash_passwords(passwords: List[str]) -> List[str]:
+    """Runs in a hash pool process"""
+    return [get_password_hash(password) for password in passwords]
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # Forking a process that already runs Motor's and asyncio's threads can copy held locks
+        _hash_pool = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _hash_pool
+
+async def hash_passwords_parallel(passwords: List[str]) -> List[str]:
+    """Hash passwords with bcrypt across the hash process pool"""
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    chunk_size = math.ceil(len(passwords) / HASH_POOL_WORKERS)
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    with trace_span("bcrypt", operation="hash_pool", count=len(passwords)):
+        results = await asyncio.gather(*[loop.run_in_executor(get_hash_pool(), _hash_passwords, chunk) for chunk in chunks])
+    return [hashed for chunk in results for hashed in chunk]
+
+def iter_roster_rows(upload: UploadFile):
+    """Yield (row_number, dict) from a CSV or NDJSON roster without loading it whole"""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    is_csv = (upload.filename or "").lower().endswith(".csv") or upload.content_type == "text/csv"
+    if is_csv:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row
+        return
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row_number, row if isinstance(row, dict) else {"_error": "Invalid JSON object"}
+
+async def import_student_batch(batch: List[tuple], seen_emails: set, request: Request) -> List[Dict[str, Any]]:
+    """Create one batch of students; return a result entry per row"""
+    from pymongo.errors import BulkWriteError
+
+    results = []
+    candidates = []
+    for row_number, row in batch:
+        fields = {field: "" if row.get(field) is None else row[field] for field in ROSTER_FIELDS}
+        invalid = [field for field, value in fields.items() if not isinstance(value, str)]
+        email = fields["email"].strip() if "email" not in invalid else ""
+        if "_error" in row:
+            results.append({"row": row_number, "email": email, "status": "error", "detail": row["_error"]})
+            continue
+        if invalid:
+            results.append({"row": row_number, "email": email, "status": "error", "detail": f"{', '.join(invalid)} must be text"})
+            continue
+        try:
+            student = UserCreate(
+                email=email,
+                full_name=fields["full_name"].strip(),
+                role=UserRole.STUDENT,
+                age_group=fields["age_group"] or None,
+                password=fields["password"]
+            )
+        except ValueError as e:
+            results.append({"row": row_number, "email": email, "status": "error", "detail": str(e)})
+            continue
+        if not student.email or not student.full_name or not student.password:
+            results.append({"row": row_number, "email": email, "status": "error", "detail": "email, full_name and password are required"})
+            continue
+        if student.email in seen_emails:
+            results.append({"row": row_number, "email": email, "status": "skipped", "detail": "Duplicate email in roster"})
+            continue
+        seen_emails.add(student.email)
+        candidates.append((row_number, student))
+
+    existing = await db.users.find(
+        {"email": {"$in": [student.email for _, student in candidates]}}, {"email": 1}
+    ).to_list(None)
+    existing_emails = {user["email"] for user in existing}
+    new_students = []
+    for row_number, student in candidates:
+        if student.email in existing_emails:
+            results.append({"row": row_number, "email": student.email, "status": "skipped", "detail": "Email already registered"})
+        else:
+            new_students.append((row_number, student))
+
+    hashed_passwords = await hash_passwords_parallel([student.password for _, student in new_students])
+    user_docs = []
+    for (row_number, student), hashed_password in zip(new_students, hashed_passwords):
+        user_dict = student.dict()
+        del user_dict["password"]
+        user_obj = User(**user_dict)
+        if user_obj.age_group:
+            user_obj.learning_level = get_learning_level_from_age(user_obj.age_group)
+        user_data = user_obj.dict()
+        user_data["hashed_password"] = hashed_password
+        user_docs.append(user_data)
+
+    failed_indexes = {}
+    if user_docs:
+        try:
+            await db.users.insert_many(user_docs, ordered=False)
+        except BulkWriteError as e:
+            failed_indexes = {error["index"]: error.get("errmsg", "Insert failed") for error in e.details["writeErrors"]}
+
+    created = []
+    created_results = {}
+    for index, ((row_number, student), user_data) in enumerate(zip(new_students, user_docs)):
+        if index in failed_indexes:
+            results.append({"row": row_number, "email": student.email, "status": "error", "detail": failed_indexes[index]})
+        else:
+            created_results[user_data["id"]] = {"row": row_number, "email": student.email, "status": "created", "user_id": user_data["id"]}
+            results.append(created_results[user_data["id"]])
+            created.append(user_data)
+
+    learning_paths = [
+        LearningPathProgress(
+            student_id=user_data["id"],
+            learning_level=user_data["learning_level"],
+            skill_progress={skill.value: 0 for skill in SkillArea}
+        ).dict()
+        for user_data in created if user_data["learning_level"]
+    ]
+    activities = [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_data["id"],
+            "activity_type": ActivityType.LOGIN.value,
+            "timestamp": datetime.utcnow(),
+            "details": {"action": "bulk_registration"},
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent")
+        }
+        for user_data in created
+    ]
+    # The accounts already exist, so follow-up failures are reported on the created rows
+    for collection, docs, owner_field, warning in (
+        (db.learning_paths, learning_paths, "student_id", "Learning path not saved; it is created on first visit"),
+        (db.activity_logs, activities, "user_id", "Registration activity not logged")
+    ):
+        if not docs:
+            continue
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                created_results[docs[error["index"]][owner_field]].setdefault("warnings", []).append(
+                    f"{warning}: {error.get('errmsg', 'Insert failed')}"
+                )
+    if created:
+        cache_bus.publish(*[f"user:{user_data['id']}" for user_data in created])
+        publish_learning_path_change(*[user_data["id"] for user_data in created])
+
+    return results
+
+@api_router.post("/admin/students/import")
+async def bulk_import_students(
+    request: Request,
+    roster: UploadFile = File(...),
+    current_user: User = Depends(get_current_admin)
+):
+    """Import a CSV or NDJSON roster of students (email, full_name, age_group, password)"""
+    results = []
+    seen_emails = set()
+    rows = iter_roster_rows(roster)
+    while True:
+        # The spooled upload may be on disk, so read and parse each batch off the event loop
+        batch = await asyncio.to_thread(lambda: list(itertools.islice(rows, BULK_IMPORT_BATCH_SIZE)))
+        if not batch:
+            break
+        results.extend(await import_student_batch(batch, seen_emails, request))
+
+    results.sort(key=lambda result: result["row"])
+    summary = {status: 0 for status in ("created", "skipped", "error")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {"total_rows": len(results), **summary, "rows": results}
 
 # Basic health check
 @api_router.get("/")
@@ -599,9 +2164,556 @@ async def root():
         "version": "2.0.0 - Unified Platform"
     }
 
+@api_router.get("/health/ready")
+async def readiness_check():
+    """Readiness probe; reports 503 until startup and warm-up have finished"""
+    payload = {"ready": _startup_state["ready"], "startup_ms": STARTUP_REPORT}
+    if not _startup_state["ready"]:
+        return JSONResponse(status_code=503, content=payload)
+    return payload
+
+@api_router.get("/admin/startup-report")
+async def get_startup_report(current_user: User = Depends(get_current_admin)):
+    """Get the startup time breakdown of this worker"""
+    return {"pid": os.getpid(), "ready": _startup_state["ready"], "phases_ms": STARTUP_REPORT}
+
+@api_router.get("/admin/slow-requests")
+async def get_slow_requests(current_user: User = Depends(get_current_admin)):
+    """Get recent slow requests with their span breakdown, newest first"""
+    return list(reversed(find_middleware(RequestTracingMiddleware).slow_requests))
+
+@api_router.get("/admin/profiling/token")
+async def get_profiling_token(ttl_seconds: int = 300, current_user: User = Depends(get_current_admin)):
+    """Mint an X-Profile header value that profiles requests until it expires"""
+    expires_at = int(time.time()) + min(ttl_seconds, 3600)
+    return {"header": "X-Profile", "value": sign_profile_token(expires_at), "expires_at": expires_at}
+
+@api_router.get("/admin/profiles")
+async def list_profiles(current_user: User = Depends(get_current_admin)):
+    """List stored request profiles, newest first"""
+    profiles = find_middleware(RequestTracingMiddleware).profiles
+    return [{k: v for k, v in profile.items() if k != "report"} for profile in reversed(profiles)]
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, current_user: User = Depends(get_current_admin)):
+    """Get the profiler report for one request"""
+    for profile in find_middleware(RequestTracingMiddleware).profiles:
+        if profile["id"] == profile_id:
+            return profile
+    raise HTTPException(status_code=404, detail="Profile not found")
+
+@api_router.get("/admin/compression")
+async def get_compression_stats(current_user: User = Depends(get_current_admin)):
+    """Get response compression ratio and CPU time per encoding"""
+    return find_middleware(CompressionMiddleware).stats()
+
+@api_router.get("/admin/admission")
+async def get_admission_stats(current_user: User = Depends(get_current_admin)):
+    """Get in-flight counts and rejection totals from admission control"""
+    return find_middleware(AdmissionControlMiddleware).stats()
+
 # Include router
 app.include_router(api_router)
 
+# Admission control: token-bucket rate limits, per-route concurrency limits and
+# priority-aware load shedding. Policies are keyed by "METHOD /path"; a key
+# ending in "*" matches by prefix. Rates are requests per second, and every
+# value can be overridden with the ADMISSION_POLICIES_JSON environment variable.
+#
+# Principal buckets are keyed by the JWT subject and only apply to
+# authenticated requests. Client buckets are keyed by the caller's address and
+# guard anonymous routes (login, register). The address is taken from
+# X-Forwarded-For as written by the outermost of TRUSTED_PROXY_HOPS proxies;
+# with no trusted proxies it is the socket peer. A school's pupils can share
+# one NAT address, so client bursts are generous.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+ADMISSION_POLICIES = {
+    "POST /api/login": {
+        "priority": "normal",
+        "route_rate": 50, "route_burst": 100,
+        "client_rate": 1, "client_burst": 40,
+        "max_concurrency": 16
+    },
+    "POST /api/register": {
+        "priority": "normal",
+        "route_rate": 20, "route_burst": 50,
+        "client_rate": 0.2, "client_burst": 40,
+        "max_concurrency": 16
+    },
+    "POST /api/subscription/checkout": {
+        "priority": "normal",
+        "route_rate": 20, "route_burst": 40,
+        "principal_rate": 0.1, "principal_burst": 3,
+        "max_concurrency": 32
+    },
+    "GET /api/analytics/students": {
+        "priority": "low",
+        "route_rate": 10, "route_burst": 20,
+        "principal_rate": 0.5, "principal_burst": 5,
+        "max_concurrency": 4
+    },
+    "POST /api/admin/students/import": {"priority": "low", "max_concurrency": 2},
+    "GET /api/me": {"priority": "critical"},
+    "GET /api/dashboard": {"priority": "critical"},
+    "POST /api/videos/heartbeat": {"priority": "critical", "principal_rate": 1, "principal_burst": 10},
+    "GET /uploads/*": {"priority": "critical"}
+}
+ADMISSION_POLICIES.update(json.loads(os.environ.get('ADMISSION_POLICIES_JSON', '{}')))
+ADMISSION_PRIORITIES = ("low", "normal", "critical")
+
+def validate_admission_policies(policies: Dict[str, Dict[str, Any]]):
+    """Reject malformed policies at startup rather than failing every request"""
+    for key, policy in policies.items():
+        if not isinstance(policy, dict):
+            raise ValueError(f"Admission policy {key!r} must be an object")
+        unknown = set(policy) - {
+            "priority", "max_concurrency",
+            "route_rate", "route_burst", "principal_rate", "principal_burst", "client_rate", "client_burst"
+        }
+        if unknown:
+            raise ValueError(f"Admission policy {key!r} has unknown settings: {', '.join(sorted(unknown))}")
+        if policy.get("priority", "normal") not in ADMISSION_PRIORITIES:
+            raise ValueError(f"Admission policy {key!r} priority must be one of {', '.join(ADMISSION_PRIORITIES)}")
+        for scope in ("route", "principal", "client"):
+            rate, burst = policy.get(f"{scope}_rate"), policy.get(f"{scope}_burst")
+            if (rate is None) != (burst is None):
+                raise ValueError(f"Admission policy {key!r} needs both {scope}_rate and {scope}_burst")
+            if rate is not None and not (isinstance(rate, (int, float)) and rate > 0 and isinstance(burst, (int, float)) and burst >= 1):
+                raise ValueError(f"Admission policy {key!r} needs {scope}_rate > 0 and {scope}_burst >= 1")
+        max_concurrency = policy.get("max_concurrency")
+        if max_concurrency is not None and not (isinstance(max_concurrency, int) and max_concurrency >= 1):
+            raise ValueError(f"Admission policy {key!r} max_concurrency must be a positive integer")
+
+validate_admission_policies(ADMISSION_POLICIES)
+
+# Shed "low" priority requests above this share of MAX_INFLIGHT_REQUESTS and
+# "normal" ones above the next; "critical" requests are never shed.
+MAX_INFLIGHT_REQUESTS = int(os.environ.get('MAX_INFLIGHT_REQUESTS', '512'))
+SHED_THRESHOLDS = {"low": 0.5, "normal": 0.9}
+MAX_TRACKED_BUCKETS = 100000
+
+class TokenBucketTable:
+    """Token buckets keyed by string, with LRU eviction of idle keys"""
+
+    def __init__(self, max_entries: int = MAX_TRACKED_BUCKETS):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Consume one token; return 0 if admitted, else seconds until a token is available"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [burst, now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / rate
+
+class AdmissionControlMiddleware:
+    """ASGI middleware enforcing ADMISSION_POLICIES"""
+
+    def __init__(self, app, policies: Dict[str, Dict[str, Any]]):
+        self.app = app
+        self.exact_policies = {k: v for k, v in policies.items() if not k.endswith("*")}
+        self.prefix_policies = [(k[:-1], v) for k, v in policies.items() if k.endswith("*")]
+        self.buckets = TokenBucketTable()
+        self.inflight = 0
+        self.route_inflight: Dict[str, int] = {}
+        self.rejections: Dict[str, int] = {}
+
+    def _policy_for(self, method: str, path: str):
+        key = f"{method} {path}"
+        policy = self.exact_policies.get(key)
+        if policy is not None:
+            return key, policy
+        for prefix, policy in self.prefix_policies:
+            if key.startswith(prefix):
+                return prefix + "*", policy
+        return None, None
+
+    @staticmethod
+    def _principal(scope) -> Optional[str]:
+        """The authenticated user id, or None for anonymous requests"""
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                try:
+                    payload = jwt.decode(value[7:].decode(), SECRET_KEY, algorithms=[ALGORITHM])
+                    return f"user:{payload.get('sub')}"
+                except jwt.PyJWTError:
+                    break
+        return None
+
+    @staticmethod
+    def _client_address(scope) -> Optional[str]:
+        """The caller's address, trusting X-Forwarded-For only for TRUSTED_PROXY_HOPS proxies"""
+        peer = scope["client"][0] if scope.get("client") else None
+        if not TRUSTED_PROXY_HOPS:
+            return peer
+        forwarded = []
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                forwarded.extend(hop.strip() for hop in value.decode("latin-1").split(",") if hop.strip())
+        # Each trusted proxy appends its peer; anything further left is client-supplied
+        hops = forwarded + ([peer] if peer else [])
+        return hops[max(0, len(hops) - 1 - TRUSTED_PROXY_HOPS)] if hops else None
+
+    async def _reject(self, scope, receive, send, route_key: str, status_code: int, retry_after: float, detail: str):
+        self.rejections[route_key] = self.rejections.get(route_key, 0) + 1
+        response = JSONResponse(
+            status_code=status_code,
+            content={"detail": detail},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_key, policy = self._policy_for(scope["method"], scope["path"])
+        priority = policy.get("priority", "normal") if policy else "normal"
+        shed_at = SHED_THRESHOLDS.get(priority)
+        if shed_at is not None and self.inflight >= MAX_INFLIGHT_REQUESTS * shed_at:
+            await self._reject(scope, receive, send, route_key or "*", 503, 1, "Server is busy, please retry")
+            return
+
+        if policy:
+            if "route_rate" in policy:
+                wait = self.buckets.take(f"route:{route_key}", policy["route_rate"], policy["route_burst"])
+                if wait:
+                    await self._reject(scope, receive, send, route_key, 429, wait, "Too many requests")
+                    return
+            principal = self._principal(scope) if "principal_rate" in policy else None
+            if principal is not None:
+                wait = self.buckets.take(f"{route_key}|{principal}", policy["principal_rate"], policy["principal_burst"])
+                if wait:
+                    await self._reject(scope, receive, send, route_key, 429, wait, "Too many requests")
+                    return
+            client_address = self._client_address(scope) if "client_rate" in policy else None
+            if client_address is not None:
+                wait = self.buckets.take(f"{route_key}|addr:{client_address}", policy["client_rate"], policy["client_burst"])
+                if wait:
+                    await self._reject(scope, receive, send, route_key, 429, wait, "Too many requests")
+                    return
+            max_concurrency = policy.get("max_concurrency")
+            if max_concurrency and self.route_inflight.get(route_key, 0) >= max_concurrency:
+                await self._reject(scope, receive, send, route_key, 503, 1, "Too many concurrent requests")
+                return
+
+        self.inflight += 1
+        if route_key:
+            self.route_inflight[route_key] = self.route_inflight.get(route_key, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+            if route_key:
+                self.route_inflight[route_key] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": MAX_INFLIGHT_REQUESTS,
+            "route_inflight": dict(self.route_inflight),
+            "rejections": dict(self.rejections),
+            "tracked_buckets": len(self.buckets._buckets)
+        }
+
+app.add_middleware(AdmissionControlMiddleware, policies=ADMISSION_POLICIES)
+
+# Response compression negotiated via Accept-Encoding: brotli (pinned in
+# requirements.txt) or gzip. Without the `brotli` package only gzip is offered.
+# Streamed responses are compressed chunk by chunk and flushed so clients still
+# receive data as it is produced.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+COMPRESSION_EXCLUDED_PREFIXES = ("/uploads",)
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+class CompressionMiddleware:
+    """ASGI middleware compressing dynamic responses with brotli or gzip"""
+
+    def __init__(self, app):
+        self.app = app
+        self.encoders = {"gzip": _GzipEncoder}
+        if brotli is not None:
+            self.encoders["br"] = _BrotliEncoder
+        self.totals = {
+            encoding: {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            for encoding in self.encoders
+        }
+
+    def _negotiate(self, scope) -> Optional[str]:
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1").lower()
+                break
+        accepted = {}
+        for part in accept.split(","):
+            coding, *params = [token.strip() for token in part.split(";")]
+            quality = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            if coding:
+                accepted[coding] = quality
+        # Highest client q-value wins; server preference (br, then gzip) only breaks ties
+        preference = [encoding for encoding in ("br", "gzip") if encoding in self.encoders]
+        candidates = [
+            (accepted.get(encoding, accepted.get("*", 0)), -rank, encoding)
+            for rank, encoding in enumerate(preference)
+        ]
+        quality, _, encoding = max(candidates, default=(0, 0, None))
+        return encoding if quality > 0 else None
+
+    @staticmethod
+    def _should_compress(headers, body: bytes, more_body: bool) -> bool:
+        if "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        return more_body or len(body) >= COMPRESSION_MIN_SIZE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(COMPRESSION_EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        totals = self.totals[encoding]
+        state = {"start": None, "encoder": None, "passthrough": False}
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state["encoder"] is None:
+                start = state["start"]
+                headers = MutableHeaders(raw=start["headers"])
+                if not self._should_compress(headers, body, more_body):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                state["encoder"] = self.encoders[encoding]()
+                totals["responses"] += 1
+                await send(start)
+
+            cpu_started = time.thread_time()
+            compressed = state["encoder"].compress(body, final=not more_body)
+            totals["cpu_seconds"] += time.thread_time() - cpu_started
+            totals["bytes_in"] += len(body)
+            totals["bytes_out"] += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for encoding, totals in self.totals.items():
+            report[encoding] = dict(
+                totals,
+                ratio=round(totals["bytes_out"] / totals["bytes_in"], 4) if totals["bytes_in"] else None
+            )
+        return {"min_size": COMPRESSION_MIN_SIZE, "gzip_level": GZIP_LEVEL, "brotli_quality": BROTLI_QUALITY, "encodings": report}
+
+app.add_middleware(CompressionMiddleware)
+
+# Slow-request log and on-demand profiling. Every request is traced; requests
+# slower than SLOW_REQUEST_MS are logged with their span breakdown. A request is
+# profiled when it carries a valid X-Profile header (minted by an admin at
+# /api/admin/profiling/token) or is picked by PROFILE_SAMPLE_RATE. Profiles use
+# pyinstrument (pinned in requirements.txt), a sampling profiler that follows
+# the request across awaits. If it cannot be imported, cProfile is the fallback:
+# it traces every call, slows the worker down and also records other requests
+# interleaved on the event loop, so it only runs for explicit X-Profile
+# requests, one at a time, and PROFILE_SAMPLE_RATE is ignored.
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_HISTORY_SIZE = int(os.environ.get('PROFILE_HISTORY_SIZE', '50'))
+SLOW_REQUEST_HISTORY_SIZE = int(os.environ.get('SLOW_REQUEST_HISTORY_SIZE', '200'))
+PYINSTRUMENT_AVAILABLE = importlib.util.find_spec("pyinstrument") is not None
+if not PYINSTRUMENT_AVAILABLE:
+    logging.warning("pyinstrument not installed; profiling falls back to cProfile for X-Profile requests only")
+
+def sign_profile_token(expires_at: int) -> str:
+    signature = hmac.new(SECRET_KEY.encode(), f"profile:{expires_at}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+def is_valid_profile_token(token: str) -> bool:
+    expires_at, _, _ = token.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(token, sign_profile_token(int(expires_at)))
+
+class _RequestProfiler:
+    """Wraps pyinstrument, or cProfile as a fallback when it is not installed"""
+
+    # cProfile hooks the whole interpreter, so only one may run at a time
+    _cprofile_active = False
+
+    def __init__(self):
+        if PYINSTRUMENT_AVAILABLE:
+            from pyinstrument import Profiler
+            self.kind = "pyinstrument"
+            self._profiler = Profiler(async_mode="enabled")
+        else:
+            import cProfile
+            self.kind = "cProfile"
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> bool:
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+            return True
+        if _RequestProfiler._cprofile_active:
+            return False
+        _RequestProfiler._cprofile_active = True
+        self._profiler.enable()
+        return True
+
+    def stop(self) -> str:
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True, show_all=False)
+        import pstats
+        self._profiler.disable()
+        _RequestProfiler._cprofile_active = False
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(60)
+        return output.getvalue()
+
+class RequestTracingMiddleware:
+    """ASGI middleware recording slow requests and running opt-in profiles"""
+
+    def __init__(self, app):
+        self.app = app
+        self.slow_requests = deque(maxlen=SLOW_REQUEST_HISTORY_SIZE)
+        self.profiles = deque(maxlen=PROFILE_HISTORY_SIZE)
+
+    def _wants_profile(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return is_valid_profile_token(value.decode("latin-1"))
+        return PYINSTRUMENT_AVAILABLE and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = {"spans": []}
+        token = _current_trace.set(trace)
+        profiler = None
+        if self._wants_profile(scope):
+            profiler = _RequestProfiler()
+            if not profiler.start():
+                profiler = None
+        status = {"code": None, "first_byte_ms": None}
+        started = time.perf_counter()
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["first_byte_ms"] = (time.perf_counter() - started) * 1000
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _current_trace.reset(token)
+            request_info = {
+                "id": str(uuid.uuid4()),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "at": datetime.utcnow().isoformat(),
+                "duration_ms": round(duration_ms, 3)
+            }
+            if profiler is not None:
+                report = profiler.stop()
+                self.profiles.append({**request_info, "profiler": profiler.kind, "report": report})
+            if duration_ms >= SLOW_REQUEST_MS:
+                self._record_slow(request_info, trace["spans"], status["first_byte_ms"])
+
+    def _record_slow(self, request_info: Dict[str, Any], spans: List[Dict[str, Any]], first_byte_ms: Optional[float]):
+        breakdown: Dict[str, float] = {}
+        for span in spans:
+            label = f"mongo:{span['collection']}" if span["kind"] == "mongo" else span["kind"]
+            breakdown[label] = round(breakdown.get(label, 0) + span["duration_ms"], 3)
+        # Handler time not covered by spans: Python code and response serialization
+        handler_ms = first_byte_ms if first_byte_ms is not None else request_info["duration_ms"]
+        attributed = sum(span["duration_ms"] for span in spans)
+        breakdown["unattributed"] = round(max(0.0, handler_ms - attributed), 3)
+        if first_byte_ms is not None:
+            breakdown["response_send"] = round(request_info["duration_ms"] - first_byte_ms, 3)
+        entry = {**request_info, "breakdown_ms": breakdown, "spans": list(spans)}
+        self.slow_requests.append(entry)
+        logger.warning(
+            f"Slow request {request_info['method']} {request_info['path']} "
+            f"{request_info['duration_ms']:.0f}ms: {breakdown}"
+        )
+
+app.add_middleware(RequestTracingMiddleware)
+
+def find_middleware(middleware_class):
+    """Return the running instance of an ASGI middleware class"""
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, middleware_class):
+        layer = getattr(layer, "app", None)
+    if layer is None:
+        raise HTTPException(status_code=503, detail=f"{middleware_class.__name__} is not running")
+    return layer
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -618,6 +2730,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_background_tasks: List[asyncio.Task] = []
+
+def start_periodic(name: str, interval_seconds: float, job):
+    """Run `await job()` every interval in the background until shutdown"""
+    async def runner():
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await job()
+            except Exception:
+                logger.exception(f"Periodic job {name} failed")
+    _background_tasks.append(asyncio.create_task(runner(), name=name))
+
+def start_once(name: str, job):
+    """Run `await job()` once in the background, logging any failure"""
+    async def runner():
+        try:
+            await job()
+        except Exception:
+            logger.exception(f"Background job {name} failed")
+    _background_tasks.append(asyncio.create_task(runner(), name=name))
+
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get('WARMUP_TIMEOUT_SECONDS', '2'))
+
+async def warm_up():
+    """Pre-touch hot paths (JWT, DB pool, serializers)"""
+    started = time.perf_counter()
+    token = create_access_token({"sub": "warmup"})
+    jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    _record_startup_phase("warmup_jwt", started)
+
+    started = time.perf_counter()
+    user = User(email="warmup@example.com", full_name="Warm Up", role=UserRole.STUDENT, age_group=AgeGroup.FOUNDATION)
+    course = Course(
+        title="Warm Up", description="", learning_level=LearningLevel.FOUNDATION,
+        skill_areas=[SkillArea.AI_LITERACY], age_group=AgeGroup.FOUNDATION, created_by=user.id
+    )
+    path = LearningPathProgress(student_id=user.id, learning_level=LearningLevel.FOUNDATION)
+    jsonable_encoder([user, course, path])
+    Token(access_token=token, token_type="bearer", user=user).model_dump_json()
+    _record_startup_phase("warmup_serializers", started)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"MongoDB warm-up ping failed: {e}")
+    _record_startup_phase("warmup_db_pool", started)
+
+async def warm_up_then_mark_ready():
+    """Runs after uvicorn starts accepting connections, so /api/health/ready can report 503 meanwhile"""
+    try:
+        await warm_up()
+    finally:
+        # Warm-up only saves first-request latency; a failed step must not keep the worker unready
+        _startup_state["ready"] = True
+        STARTUP_REPORT["total_to_ready"] = round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 2)
+        logger.info(f"Worker {os.getpid()} ready; startup breakdown (ms): {STARTUP_REPORT}")
+
+@app.on_event("startup")
+async def startup_services():
+    global client, db
+    started = time.perf_counter()
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    _record_startup_phase("upload_dirs", started)
+
+    started = time.perf_counter()
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[make_mongo_span_listener()])
+    db = client[os.environ['DB_NAME']]
+    _record_startup_phase("db_client", started)
+
+    started = time.perf_counter()
+    cache_bus.start()
+    _record_startup_phase("cache_bus", started)
+
+    start_once("course_counter_indexes", course_counters.ensure_indexes)
+    start_once("learning_path_indexes", ensure_learning_path_indexes)
+    start_periodic("course_counter_flush", COUNTER_FLUSH_SECONDS, course_counters.flush)
+    start_periodic("course_counter_reconcile", COUNTER_RECONCILE_SECONDS, course_counters.reconcile)
+    start_periodic("video_progress_flush", VIDEO_PROGRESS_FLUSH_SECONDS, video_progress.flush)
+    start_periodic("leaderboard_refresh", LEADERBOARD_REFRESH_SECONDS, leaderboards.refresh)
+    start_periodic("leaderboard_snapshot", LEADERBOARD_SNAPSHOT_SECONDS, leaderboards.snapshot)
+    start_periodic("activity_archive", ACTIVITY_ARCHIVE_INTERVAL_SECONDS, activity_archive.archive_cold_events)
+
+    start_once("warm_up", warm_up_then_mark_ready)
+    STARTUP_REPORT["total_to_accepting"] = round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 2)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await stop_background_tasks()
+    await course_counters.flush()
+    await video_progress.flush()
+    cache_bus.stop()
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+    if client is not None:
+        client.close()
+
+_record_startup_phase("module_import", _MODULE_LOAD_STARTED)
+
+# Multi-worker entry point:
+#   WEB_CONCURRENCY=4 python server.py
+# starts one uvicorn worker per WEB_CONCURRENCY (default: all cores). Workers share
+# cache invalidations through CACHE_BUS_DIR, which must be local to the host.
+if __name__ == "__main__":
+    import uvicorn
+    # Workers re-import this module; let them size their hash pools for this worker count
+    os.environ.setdefault('WEB_CONCURRENCY', str(WEB_CONCURRENCY))
+    uvicorn.run(
+        "server:app",
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        workers=WEB_CONCURRENCY,
+    )
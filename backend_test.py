@@ -1,5 +1,6 @@
 import requests
 import sys
+import os
 import json
 from datetime import datetime
 
@@ -11,8 +12,9 @@ class SteamLankaAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.created_course_id = None
+        self.admin_token = None
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, params=None):
+    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, params=None, files=None):
         """Run a single API test"""
         url = f"{self.base_url}/{endpoint}"
         headers = {'Content-Type': 'application/json'}
@@ -26,6 +28,9 @@ class SteamLankaAPITester:
         try:
             if method == 'GET':
                 response = requests.get(url, headers=headers, params=params)
+            elif method == 'POST' and files:
+                del headers['Content-Type']
+                response = requests.post(url, files=files, headers=headers)
             elif method == 'POST':
                 response = requests.post(url, json=data, headers=headers)
             elif method == 'PUT':
@@ -270,6 +275,177 @@ class SteamLankaAPITester:
         )
         return success
 
+    def test_leaderboards(self):
+        """Test leaderboard access rules for teachers and students"""
+        if not self.teacher_token or not self.student_token:
+            print("❌ Teacher and student tokens required")
+            return False
+
+        success, _ = self.run_test(
+            "Teacher Leaderboard Without Age Group (Should Fail)",
+            "GET",
+            "leaderboards",
+            400,
+            token=self.teacher_token
+        )
+        teacher_ok, response = self.run_test(
+            "Teacher Leaderboard",
+            "GET",
+            "leaderboards",
+            200,
+            token=self.teacher_token,
+            params={"age_group": "9-12"}
+        )
+        success = success and teacher_ok and all("student_id" in entry for entry in response.get("entries", []))
+
+        _, profile = self.run_test("Student Profile For Leaderboard", "GET", "me", 200, token=self.student_token)
+        own_group = profile.get("age_group")
+        if not own_group:
+            student_ok, _ = self.run_test(
+                "Student Without Age Group Leaderboard (Should Fail)",
+                "GET",
+                "leaderboards",
+                403,
+                token=self.student_token
+            )
+            return success and student_ok
+
+        student_ok, response = self.run_test(
+            "Student Own Age Group Leaderboard",
+            "GET",
+            "leaderboards",
+            200,
+            token=self.student_token
+        )
+        if student_ok and any("student_id" in entry for entry in response.get("entries", [])):
+            print("❌ Student leaderboard exposes student ids")
+            student_ok = False
+        other_group = "13-16" if own_group != "13-16" else "5-8"
+        forbidden_ok, _ = self.run_test(
+            "Student Other Age Group Leaderboard (Should Fail)",
+            "GET",
+            "leaderboards",
+            403,
+            token=self.student_token,
+            params={"age_group": other_group}
+        )
+        return success and student_ok and forbidden_ok
+
+    def test_video_heartbeat(self):
+        """Test video heartbeat validation"""
+        if not self.student_token:
+            print("❌ No student token available")
+            return False
+
+        beat = {
+            "course_id": self.created_course_id or "missing-course",
+            "video_id": "missing-video",
+            "position_seconds": 10,
+            "duration_seconds": 120
+        }
+        success, _ = self.run_test(
+            "Heartbeat For Unknown Video (Should Fail)",
+            "POST",
+            "videos/heartbeat",
+            404,
+            data=beat,
+            token=self.student_token
+        )
+        invalid_ok, _ = self.run_test(
+            "Heartbeat With Negative Position (Should Fail)",
+            "POST",
+            "videos/heartbeat",
+            422,
+            data={**beat, "position_seconds": -1},
+            token=self.student_token
+        )
+        return success and invalid_ok
+
+    def test_student_import(self):
+        """Test bulk student import (admin credentials via ADMIN_EMAIL / ADMIN_PASSWORD)"""
+        if not self.teacher_token:
+            print("❌ No teacher token available")
+            return False
+
+        stamp = datetime.now().strftime('%H%M%S%f')
+        roster = (
+            "email,full_name,age_group,password\n"
+            f"import{stamp}@test.com,Imported Student,9-12,import123\n"
+            f"import{stamp}@test.com,Duplicate Row,9-12,import123\n"
+            "missing-name@test.com,,9-12,import123\n"
+        )
+        files = {"roster": ("roster.csv", roster, "text/csv")}
+        success, _ = self.run_test(
+            "Teacher Student Import (Should Fail)",
+            "POST",
+            "admin/students/import",
+            403,
+            token=self.teacher_token,
+            files=files
+        )
+
+        admin_email, admin_password = os.environ.get("ADMIN_EMAIL"), os.environ.get("ADMIN_PASSWORD")
+        if not admin_email or not admin_password:
+            print("   Skipping admin import: set ADMIN_EMAIL and ADMIN_PASSWORD to run it")
+            return success
+        login_ok, response = self.run_test(
+            "Admin Login",
+            "POST",
+            "login",
+            200,
+            data={"email": admin_email, "password": admin_password}
+        )
+        if not login_ok:
+            return False
+        self.admin_token = response['access_token']
+
+        import_ok, response = self.run_test(
+            "Admin Student Import",
+            "POST",
+            "admin/students/import",
+            200,
+            token=self.admin_token,
+            files=files
+        )
+        statuses = [row["status"] for row in response.get("rows", [])]
+        if import_ok and statuses != ["created", "skipped", "error"]:
+            print(f"❌ Unexpected import row statuses: {statuses}")
+            import_ok = False
+        return success and import_ok
+
+    def test_dashboard(self):
+        """Test the single round-trip dashboard payload"""
+        if not self.student_token or not self.teacher_token:
+            print("❌ Teacher and student tokens required")
+            return False
+
+        success, response = self.run_test(
+            "Student Dashboard",
+            "GET",
+            "dashboard",
+            200,
+            token=self.student_token
+        )
+        expected_keys = {"user", "framework", "learning_path", "enrollments", "courses", "stats"}
+        if success and not expected_keys <= set(response):
+            print(f"❌ Dashboard missing keys: {expected_keys - set(response)}")
+            success = False
+        if success and response["learning_path"] is None:
+            print("❌ Student dashboard has no learning path")
+            success = False
+
+        teacher_ok, response = self.run_test(
+            "Teacher Dashboard",
+            "GET",
+            "dashboard",
+            200,
+            token=self.teacher_token
+        )
+        if teacher_ok and response.get("learning_path") is not None:
+            print("❌ Teacher dashboard should not include a learning path")
+            teacher_ok = False
+        return success and teacher_ok
+
 def main():
     print("🚀 Starting Steam Lanka Educational Platform API Tests")
     print("=" * 60)
@@ -290,8 +466,12 @@ def main():
         ("Get Specific Course", tester.test_get_specific_course),
         ("Student Enrollment", tester.test_student_enroll),
         ("Student Enrollments", tester.test_student_enrollments),
+        ("Dashboard", tester.test_dashboard),
         ("Unauthorized Access", tester.test_unauthorized_access),
         ("Student Create Course (Forbidden)", tester.test_student_create_course_forbidden),
+        ("Leaderboards", tester.test_leaderboards),
+        ("Video Heartbeat", tester.test_video_heartbeat),
+        ("Student Import", tester.test_student_import),
     ]
     
     # Run all tests
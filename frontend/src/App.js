@@ -469,16 +469,11 @@ const Dashboard = () => {
   useEffect(() => {
     const loadDashboardData = async () => {
       try {
-        const coursesResponse = await axios.get(`${API}/courses`);
-        setRecentCourses(coursesResponse.data.slice(0, 4));
-        setStats(prev => ({ ...prev, courses: coursesResponse.data.length }));
-
-        if (isStudent) {
-          const enrollmentsResponse = await axios.get(`${API}/my-enrollments`, {
-            headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
-          });
-          setStats(prev => ({ ...prev, enrollments: enrollmentsResponse.data.length }));
-        }
+        const response = await axios.get(`${API}/dashboard`, {
+          headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+        });
+        setRecentCourses(response.data.courses.slice(0, 4));
+        setStats(prev => ({ ...prev, ...response.data.stats }));
       } catch (error) {
         console.error('Failed to load dashboard data:', error);
       }
@@ -730,7 +725,7 @@ const Dashboard = () => {
                       <p className="text-sm text-gray-600 mb-3 line-clamp-2">{course.description}</p>
                       <div className="flex justify-between items-center">
                         <span className="text-xs text-gray-500">
-                          {course.videos?.length || 0} lessons
+                          {course.video_count ?? course.videos?.length ?? 0} lessons
                         </span>
                         <button className="text-purple-600 hover:text-purple-700 text-sm font-medium">
                           Explore →
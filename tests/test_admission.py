@@ -0,0 +1,73 @@
+import pytest
+
+import server
+
+Admission = server.AdmissionControlMiddleware
+
+
+def scope(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"client": (peer, 4321), "headers": headers}
+
+
+def test_client_address_ignores_forwarded_for_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+    assert Admission._client_address(scope("6.6.6.6")) == "10.0.0.1"
+
+
+@pytest.mark.parametrize("forwarded, expected", [
+    ("1.1.1.1", "1.1.1.1"),
+    ("6.6.6.6, 1.1.1.1", "1.1.1.1"),
+    (None, "10.0.0.1"),
+])
+def test_client_address_uses_hop_written_by_trusted_proxy(monkeypatch, forwarded, expected):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    assert Admission._client_address(scope(forwarded)) == expected
+
+
+def test_client_address_with_two_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    assert Admission._client_address(scope("6.6.6.6, 1.1.1.1, 172.16.0.2")) == "1.1.1.1"
+
+
+def test_default_policies_are_valid():
+    server.validate_admission_policies(server.ADMISSION_POLICIES)
+
+
+@pytest.mark.parametrize("policy", [
+    {"route_rate": 5},
+    {"client_burst": 5},
+    {"principal_rate": 0, "principal_burst": 5},
+    {"priority": "urgent"},
+    {"max_concurrency": 0},
+    {"route_limit": 5},
+])
+def test_malformed_policies_are_rejected(policy):
+    with pytest.raises(ValueError):
+        server.validate_admission_policies({"GET /api/x": policy})
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    table = server.TokenBucketTable()
+    assert [table.take("k", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert table.take("k", rate=2, burst=3) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert table.take("k", rate=2, burst=3) == 0
+    clock.advance(60)
+    assert [table.take("k", rate=2, burst=3) for _ in range(4)][-1] > 0
+
+
+def test_token_buckets_are_independent_per_key(clock):
+    table = server.TokenBucketTable()
+    table.take("a", rate=1, burst=1)
+    assert table.take("a", rate=1, burst=1) > 0
+    assert table.take("b", rate=1, burst=1) == 0
+
+
+def test_token_bucket_table_evicts_least_recently_used(clock):
+    table = server.TokenBucketTable(max_entries=2)
+    table.take("a", rate=1, burst=1)
+    table.take("b", rate=1, burst=1)
+    table.take("a", rate=1, burst=1)
+    table.take("c", rate=1, burst=1)
+    assert list(table._buckets) == ["a", "c"]
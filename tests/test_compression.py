@@ -0,0 +1,52 @@
+import gzip
+
+import pytest
+
+import server
+
+
+def middleware(*encodings):
+    compression = server.CompressionMiddleware(app=None)
+    compression.encoders = {encoding: object for encoding in encodings}
+    return compression
+
+
+def negotiate(compression, accept_encoding):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return compression._negotiate({"headers": headers})
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("gzip, br", "br"),
+    ("br, gzip", "br"),
+    ("gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.3, gzip;q=0.8", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("*;q=0", None),
+    ("*;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    (None, None),
+    ("br ; q=0.2 , gzip ; q=0.1", "br"),
+    ("gzip;level=1;q=0.9, br;q=0.4", "gzip"),
+    ("GZIP;Q=1, BR;Q=0.5", "gzip"),
+    ("br;q=bogus, gzip", "gzip"),
+])
+def test_negotiate_prefers_highest_q_then_server_order(accept_encoding, expected):
+    assert negotiate(middleware("gzip", "br"), accept_encoding) == expected
+
+
+def test_negotiate_only_offers_available_encoders():
+    assert negotiate(middleware("gzip"), "br") is None
+    assert negotiate(middleware("gzip"), "br, gzip;q=0.1") == "gzip"
+
+
+def test_gzip_encoder_streams_chunks_that_round_trip():
+    encoder = server._GzipEncoder()
+    chunks = [b'{"rows": [', b'"' + b"x" * 4096 + b'"', b"]}"]
+    compressed = b"".join(encoder.compress(chunk, final=False) for chunk in chunks) + encoder.compress(b"", final=True)
+    assert gzip.decompress(compressed) == b"".join(chunks)
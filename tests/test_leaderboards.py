@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+import server
+
+
+def reference_order(scores):
+    return sorted(scores, key=lambda member: server.RankedSet._sort_key(member, scores[member]))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ranked_set_matches_sorted_reference(seed):
+    rng = random.Random(seed)
+    ranked = server.RankedSet()
+    scores = {}
+    for _ in range(500):
+        member = f"s{rng.randrange(60)}"
+        if rng.random() < 0.2:
+            ranked.discard(member)
+            scores.pop(member, None)
+        else:
+            score = (rng.randrange(10), rng.randrange(5))
+            ranked.upsert(member, score)
+            scores[member] = score
+    order = reference_order(scores)
+    assert len(ranked) == len(scores)
+    assert ranked.top(len(scores) + 5) == [(member, scores[member]) for member in order]
+    assert ranked.top(3) == [(member, scores[member]) for member in order[:3]]
+    for position, member in enumerate(order, start=1):
+        assert ranked.rank(member) == position
+
+
+def test_ranked_set_ties_break_by_member_and_missing_rank_is_none():
+    ranked = server.RankedSet()
+    ranked.upsert("b", (5, 0))
+    ranked.upsert("a", (5, 0))
+    ranked.upsert("c", (7, 0))
+    assert [member for member, _ in ranked.top(3)] == ["c", "a", "b"]
+    assert ranked.rank("zzz") is None
+    ranked.upsert("a", (5, 0))
+    assert len(ranked) == 3
+
+
+def test_students_see_names_but_not_ids():
+    entries = [
+        {"rank": 1, "student_id": "s1", "full_name": "One", "score": 10, "tiebreak": 0},
+        {"rank": 2, "student_id": "s2", "full_name": "Two", "score": 5, "tiebreak": 0},
+    ]
+    student = server.User(id="s2", email="s2@x", full_name="Two", role=server.UserRole.STUDENT)
+    teacher = server.User(email="t@x", full_name="T", role=server.UserRole.TEACHER)
+    visible = server.leaderboard_entries_for(student, entries)
+    assert all("student_id" not in entry for entry in visible)
+    assert [entry["is_me"] for entry in visible] == [False, True]
+    assert server.leaderboard_entries_for(teacher, entries) == entries
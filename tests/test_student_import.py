@@ -0,0 +1,86 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import server
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class FakeUsers:
+    def __init__(self, existing_emails):
+        self.existing_emails = existing_emails
+
+    def find(self, query, projection=None):
+        wanted = query["email"]["$in"]
+        return FakeCursor([{"email": email} for email in wanted if email in self.existing_emails])
+
+
+def import_rows(monkeypatch, rows, existing_emails=()):
+    # No row reaches the insert, so the other collections are never written
+    monkeypatch.setattr(server, "db", SimpleNamespace(
+        users=FakeUsers(set(existing_emails)), learning_paths=None, activity_logs=None
+    ))
+    batch = list(enumerate(rows, start=1))
+    return asyncio.run(server.import_student_batch(batch, set(), request=None))
+
+
+def test_non_text_fields_are_reported_per_row(monkeypatch):
+    results = import_rows(monkeypatch, [
+        {"email": 5, "full_name": "Five", "password": "pw"},
+        {"email": "list@x", "full_name": ["A"], "password": 123},
+        {"email": "nested@x", "full_name": "N", "password": "pw", "age_group": {"min": 5}},
+    ])
+    assert [result["status"] for result in results] == ["error", "error", "error"]
+    assert results[0] == {"row": 1, "email": "", "status": "error", "detail": "email must be text"}
+    assert results[1]["email"] == "list@x"
+    assert results[1]["detail"] == "full_name, password must be text"
+    assert results[2]["detail"] == "age_group must be text"
+
+
+def test_missing_fields_bad_age_group_and_parse_errors(monkeypatch):
+    results = import_rows(monkeypatch, [
+        {"email": " a@x ", "full_name": " ", "password": "pw"},
+        {"email": "b@x", "full_name": "B", "password": "pw", "age_group": "99-100"},
+        {"_error": "Invalid JSON object"},
+    ])
+    assert results[0]["detail"] == "email, full_name and password are required"
+    assert results[0]["email"] == "a@x"
+    assert results[1]["status"] == "error" and results[1]["email"] == "b@x"
+    assert results[2] == {"row": 3, "email": "", "status": "error", "detail": "Invalid JSON object"}
+
+
+def test_duplicates_in_roster_and_existing_accounts_are_skipped(monkeypatch):
+    results = import_rows(monkeypatch, [
+        {"email": "taken@x", "full_name": "T", "password": "pw"},
+        {"email": "taken@x", "full_name": "T again", "password": "pw"},
+    ], existing_emails={"taken@x"})
+    details = sorted(result["detail"] for result in results)
+    assert [result["status"] for result in results] == ["skipped", "skipped"]
+    assert details == ["Duplicate email in roster", "Email already registered"]
+
+
+def roster(content, filename, content_type):
+    return SimpleNamespace(file=io.BytesIO(content.encode()), filename=filename, content_type=content_type)
+
+
+def test_iter_roster_rows_reads_csv_and_ndjson():
+    csv_rows = list(server.iter_roster_rows(roster(
+        "\ufeffemail,full_name,password\na@x,\"Doe, A\",pw\n", "r.csv", "text/csv"
+    )))
+    assert csv_rows == [(1, {"email": "a@x", "full_name": "Doe, A", "password": "pw"})]
+
+    ndjson_rows = list(server.iter_roster_rows(roster(
+        '{"email": "a@x"}\n\nnot json\n[1, 2]\n', "r.ndjson", "application/x-ndjson"
+    )))
+    assert ndjson_rows == [
+        (1, {"email": "a@x"}),
+        (3, {"_error": "Invalid JSON object"}),
+        (4, {"_error": "Invalid JSON object"}),
+    ]
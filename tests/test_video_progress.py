@@ -0,0 +1,122 @@
+import asyncio
+import math
+
+import pytest
+
+import server
+from tests.conftest import run
+
+
+def make_tracker(monkeypatch, duration_seconds):
+    tracker = server.VideoProgressTracker()
+
+    async def open_state(user_id, beat):
+        return tracker._new_state(beat.course_id, duration_seconds, False)
+
+    monkeypatch.setattr(tracker, "_open_state", open_state)
+    return tracker
+
+
+def beat(position, duration):
+    return server.VideoHeartbeat(course_id="c", video_id="v", position_seconds=position, duration_seconds=duration)
+
+
+@pytest.mark.parametrize("duration", [30, 40, 45])
+def test_steady_cadence_full_watch_completes(monkeypatch, clock, duration):
+    tracker = make_tracker(monkeypatch, duration)
+    interval = server.VIDEO_HEARTBEAT_INTERVAL_SECONDS
+    progress = None
+    for tick in range(1, math.ceil(duration / interval) + 1):
+        clock.advance(interval)
+        progress = run(tracker.record("u", beat(min(tick * interval, duration), duration)))
+    assert progress["watched_percentage"] == 100.0
+    assert progress["crossed_threshold"]
+
+
+def test_first_beat_covers_start(monkeypatch, clock):
+    tracker = make_tracker(monkeypatch, 120)
+    clock.advance(10)
+    progress = run(tracker.record("u", beat(10, 120)))
+    assert tracker._states[("u", "v")]["buckets"] == {0, 1}
+    assert progress["watched_percentage"] == round(100 * 2 / 24, 1)
+
+
+def test_jumping_ahead_is_capped_by_wall_clock(monkeypatch, clock):
+    tracker = make_tracker(monkeypatch, 600)
+    clock.advance(10)
+    for position in range(10, 601, 10):
+        progress = run(tracker.record("u", beat(position, 600)))
+    assert progress["watched_percentage"] < 5
+    assert not progress["crossed_threshold"]
+    assert tracker._pending_seconds["u"] <= 15
+
+
+def test_jittered_cadence_does_not_lose_buckets(monkeypatch, clock):
+    tracker = make_tracker(monkeypatch, 60)
+    position = 0
+    for gap in [9.9, 10.2, 9.8, 10.1, 9.9, 10.1]:
+        clock.advance(gap)
+        position = min(position + gap, 60)
+        progress = run(tracker.record("u", beat(position, 60)))
+    assert progress["watched_percentage"] == 100.0
+
+
+class FakeCollection:
+    def __init__(self, document=None):
+        self.document = document
+
+    async def find_one(self, query, projection=None):
+        return self.document
+
+
+def fake_db(monkeypatch, video, enrolled=True, stored=None):
+    course = {"videos": [video]} if video is not None else None
+    monkeypatch.setattr(server, "db", type("FakeDB", (), {
+        "courses": FakeCollection(course),
+        "enrollments": FakeCollection({"_id": 1} if enrolled else None),
+        "video_progress": FakeCollection(stored),
+    })())
+
+
+def test_open_state_requires_video_in_course(monkeypatch):
+    fake_db(monkeypatch, None)
+    with pytest.raises(server.HTTPException) as error:
+        asyncio.run(server.VideoProgressTracker()._open_state("u", beat(0, 60)))
+    assert error.value.status_code == 404
+
+
+def test_open_state_requires_enrollment(monkeypatch):
+    fake_db(monkeypatch, {"id": "v"}, enrolled=False)
+    with pytest.raises(server.HTTPException) as error:
+        asyncio.run(server.VideoProgressTracker()._open_state("u", beat(0, 60)))
+    assert error.value.status_code == 403
+
+
+def test_course_duration_wins_over_client(monkeypatch):
+    fake_db(monkeypatch, {"id": "v", "duration_seconds": 120})
+    state = asyncio.run(server.VideoProgressTracker()._open_state("u", beat(0, 1)))
+    assert state["duration_seconds"] == 120
+
+
+def test_tiny_client_duration_cannot_forge_completion(monkeypatch, clock):
+    fake_db(monkeypatch, {"id": "v"})
+    tracker = server.VideoProgressTracker()
+    progress = asyncio.run(tracker.record("u", beat(0, 1)))
+    assert tracker._states[("u", "v")]["duration_seconds"] == server.VIDEO_MIN_CLIENT_DURATION_SECONDS
+    clock.advance(1)
+    progress = asyncio.run(tracker.record("u", beat(1, 1)))
+    assert not progress["crossed_threshold"]
+
+
+def test_replayed_and_out_of_order_beats_merge(monkeypatch, clock):
+    tracker = make_tracker(monkeypatch, 60)
+    for position in (10, 20):
+        clock.advance(10)
+        run(tracker.record("u", beat(position, 60)))
+    credited = tracker._pending_seconds["u"]
+    for position in (20, 10, 20):
+        clock.advance(10)
+        progress = run(tracker.record("u", beat(position, 60)))
+    assert tracker._states[("u", "v")]["buckets"] == {0, 1, 2, 3}
+    assert progress["watched_percentage"] == round(100 * 4 / 12, 1)
+    assert tracker._pending_seconds["u"] == credited